@@ -0,0 +1,228 @@
+"""Resilient model calls shared by ShopSmart AI and Research Pro.
+
+Provider errors are classified by type instead of by matching text, retries
+use jittered exponential backoff under an overall deadline, a circuit
+breaker stops hammering a model that keeps failing, and calls can fall back
+(or be hedged after a latency threshold) to a second model.
+"""
+import asyncio
+import random
+import time
+from enum import Enum
+
+
+class ErrorKind(Enum):
+    OVERLOADED = "overloaded"      # 503/529: the model is busy, back off and maybe fall back
+    RATE_LIMITED = "rate_limited"  # 429: quota, back off longer
+    TRANSIENT = "transient"        # 5xx, timeouts, dropped connections
+    FATAL = "fatal"                # bad request, auth, anything retrying won't fix
+
+    @property
+    def retryable(self) -> bool:
+        return self is not ErrorKind.FATAL
+
+
+class CircuitOpenError(Exception):
+    """Raised when every model's circuit breaker is open"""
+
+
+# Exception class names (from httpx / provider SDKs) that mean the network hiccuped
+TRANSIENT_ERROR_NAMES = {
+    "TimeoutException", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout",
+    "ConnectError", "ReadError", "RemoteProtocolError", "NetworkError", "ServerDisconnectedError",
+}
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(exc: BaseException) -> ErrorKind:
+    """Map a provider exception to an ErrorKind"""
+    if isinstance(exc, CircuitOpenError):
+        return ErrorKind.OVERLOADED
+
+    status = _status_code(exc)
+    if status is not None:
+        if status in (503, 529):
+            return ErrorKind.OVERLOADED
+        if status == 429:
+            return ErrorKind.RATE_LIMITED
+        if status >= 500 or status in (408, 409):
+            return ErrorKind.TRANSIENT
+        return ErrorKind.FATAL
+
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return ErrorKind.TRANSIENT
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__):
+        return ErrorKind.TRANSIENT
+
+    # Some SDKs only put the provider status in the message
+    message = str(exc).upper()
+    if "UNAVAILABLE" in message or "OVERLOADED" in message:
+        return ErrorKind.OVERLOADED
+    if "RESOURCE_EXHAUSTED" in message:
+        return ErrorKind.RATE_LIMITED
+    return ErrorKind.FATAL
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures, half-open again after a cool-down"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Closed and half-open breakers let calls through (half-open as a trial)"""
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """Full-jitter exponential backoff bounded by attempts and an overall deadline"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 8.0, deadline: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int, kind: ErrorKind) -> float:
+        # Quota errors clear more slowly than a momentarily busy model
+        base = self.base_delay * (4 if kind is ErrorKind.RATE_LIMITED else 1)
+        return random.uniform(0, min(self.max_delay, base * 2 ** attempt))
+
+
+class ResilientCaller:
+    """Runs model calls with classification, backoff, circuit breaking and fallback
+
+    make_call(model_name) must return an awaitable; it may be invoked for the
+    primary and the fallback model concurrently when hedging, so it should not
+    mutate shared state (update conversation history from the returned result).
+    on_retry(kind), when given, is called for every retry that will happen.
+    """
+
+    def __init__(self, primary: str, fallback: str = None, policy: RetryPolicy = None,
+                 hedge_after: float = None, fallback_after_attempts: int = 2,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, log=print, on_retry=None):
+        self.primary = primary
+        self.fallback = fallback or None
+        self.policy = policy or RetryPolicy()
+        self.hedge_after = hedge_after
+        self.fallback_after_attempts = fallback_after_attempts
+        self.breakers = {
+            name: CircuitBreaker(failure_threshold, reset_timeout)
+            for name in (self.primary, self.fallback) if name
+        }
+        self.log = log
+        self.on_retry = on_retry
+
+    def choose_model(self, attempt: int = 0) -> str:
+        """Model for this attempt: primary until it fails repeatedly or its circuit opens"""
+        use_fallback = self.fallback and attempt >= self.fallback_after_attempts
+        candidates = [self.fallback, self.primary] if use_fallback else [self.primary, self.fallback]
+        for name in candidates:
+            if name and self.breakers[name].allow():
+                return name
+        raise CircuitOpenError(f"Circuit open for {', '.join(self.breakers)}")
+
+    def record_success(self, model: str):
+        self.breakers[model].record_success()
+
+    def record_failure(self, model: str, exc: BaseException):
+        # Bad requests say nothing about the model's health
+        if classify_error(exc).retryable:
+            self.breakers[model].record_failure()
+
+    def retry_delay(self, exc: BaseException, attempt: int, deadline: float):
+        """Seconds to wait before retrying after exc, or None if it shouldn't be retried"""
+        kind = classify_error(exc)
+        if not kind.retryable or attempt + 1 >= self.policy.max_attempts:
+            return None
+        delay = self.policy.backoff(attempt, kind)
+        if time.monotonic() + delay >= deadline:
+            return None
+        if self.on_retry is not None:
+            self.on_retry(kind)
+        return delay
+
+    def new_deadline(self) -> float:
+        return time.monotonic() + self.policy.deadline
+
+    async def _tracked(self, make_call, model: str, deadline: float):
+        try:
+            result = await asyncio.wait_for(make_call(model), timeout=max(deadline - time.monotonic(), 0.001))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.record_failure(model, e)
+            raise
+        self.record_success(model)
+        return result
+
+    async def _hedged(self, make_call, model: str, deadline: float):
+        """Run the call; if the primary is slow, race the fallback against it"""
+        hedge_model = self.fallback if model == self.primary else None
+        if not self.hedge_after or not hedge_model or not self.breakers[hedge_model].allow():
+            return await self._tracked(make_call, model, deadline)
+
+        primary_task = asyncio.ensure_future(self._tracked(make_call, model, deadline))
+        pending = {primary_task}
+        error = None
+        # Whatever ends the race, including the caller being cancelled, stops the calls still running
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after)
+            if done:
+                return primary_task.result()
+
+            self.log(f"⏱️ {model} slower than {self.hedge_after}s, hedging with {hedge_model}")
+            pending.add(asyncio.ensure_future(self._tracked(make_call, hedge_model, deadline)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, make_call):
+        """Await make_call(model) with retries, returning the first successful result"""
+        deadline = self.new_deadline()
+        attempt = 0
+        while True:
+            model = self.choose_model(attempt)
+            try:
+                return await self._hedged(make_call, model, deadline)
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                self.log(f"⚠️ {model} failed ({classify_error(e).value}), retrying in {delay:.1f}s... "
+                         f"(Attempt {attempt + 1}/{self.policy.max_attempts})")
+                await asyncio.sleep(delay)
+                attempt += 1
@@ -0,0 +1,98 @@
+"""Cold-start measurements for the apps' startup benchmarks.
+
+Each run starts a fresh interpreter, so nothing is already imported; the OS
+file cache is warm after the first run, which is what a restart sees too.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_PROBE = """
+import json, time
+start = time.perf_counter()
+{import_statement}
+imported = time.perf_counter()
+{ready_statement}
+ready = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - start) * 1000, "ready_ms": (ready - start) * 1000}}))
+"""
+
+
+def run_probe(cwd: str, import_statement: str, ready_statement: str, env: dict = None):
+    """(timings, -X importtime report) of one fresh interpreter importing and then readying an app"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         _PROBE.format(import_statement=import_statement, ready_statement=ready_statement)],
+        cwd=cwd, env={**os.environ, **(env or {})}, capture_output=True, text=True, check=True,
+    )
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    return timings, completed.stderr
+
+
+def _rows(report: str) -> list:
+    """(depth, cumulative ms, name) per line of a -X importtime report, in report order"""
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # The header line
+        rows.append((len(name) - len(name.lstrip()), int(cumulative) / 1000, name.strip()))
+    return rows
+
+
+def slowest_imports(report: str, module: str, top: int = 10) -> tuple:
+    """Slowest imports as (cumulative ms, name) lists, slowest first
+
+    The first list is what `module` imports directly; the second is what was
+    first imported after it, i.e. while the app got ready.
+    """
+    rows = _rows(report)
+    direct = []
+    deferred = []
+    for index, (depth, _, name) in enumerate(rows):
+        if name != module:
+            continue
+        # importtime lists children before their parent, one indentation level deeper
+        for child_depth, ms, child in reversed(rows[:index]):
+            if child_depth <= depth:
+                break
+            if child_depth == depth + 2:
+                direct.append((ms, child))
+        deferred = [(ms, later) for later_depth, ms, later in rows[index + 1:] if later_depth == depth]
+    return sorted(direct, reverse=True)[:top], sorted(deferred, reverse=True)[:top]
+
+
+def measure(cwd: str, module: str, ready_statement: str, runs: int = 5, env: dict = None) -> dict:
+    """Median import and import-to-ready times over `runs` cold starts, plus the slowest imports"""
+    samples = []
+    report = ""
+    for _ in range(runs):
+        timings, report = run_probe(cwd, f"import {module}", ready_statement, env)
+        samples.append(timings)
+    direct, deferred = slowest_imports(report, module)
+    return {
+        "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+        "ready_ms": statistics.median(sample["ready_ms"] for sample in samples),
+        "slowest": direct,
+        "deferred": deferred,
+    }
+
+
+def print_report(result: dict, budget_ms: float = None) -> int:
+    """Print a measure() result; returns the exit status (1 if the import is over budget)"""
+    print(f"import: {result['import_ms']:.0f} ms (median)")
+    print(f"ready:  {result['ready_ms']:.0f} ms (median, import + first-use loading)")
+    print("\nslowest direct imports (cumulative ms):")
+    for ms, name in result["slowest"]:
+        print(f"  {ms:>8.1f}  {name}")
+    print("\nslowest imports loaded on first use (cumulative ms):")
+    for ms, name in result["deferred"]:
+        print(f"  {ms:>8.1f}  {name}")
+    if budget_ms is not None and result["import_ms"] > budget_ms:
+        print(f"\n❌ import took {result['import_ms']:.0f} ms, over the {budget_ms:.0f} ms budget")
+        return 1
+    return 0
@@ -0,0 +1,179 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    """The wait queue is full (or the wait too long); retry_after is a hint in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Busy, retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average with bursts of up to `burst`; a rate of 0 means no limit"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 0.0)
+        self.unlimited = self.rate == 0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        if self.unlimited:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """Seconds until the next token is available"""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Concurrency limit and rate limit in front of model calls
+
+    Callers that can't start immediately wait in a bounded queue. Waiters are
+    grouped by session and served round-robin, so one busy shopper can't starve
+    the others; when the queue is full callers are rejected straight away with
+    a retry hint instead of piling up.
+    """
+
+    def __init__(self, max_concurrent: int = 4, rate: float = 5.0, burst: int = 10,
+                 max_queue: int = 50, max_wait: float = 30.0):
+        self.max_concurrent = max_concurrent
+        self.bucket = TokenBucket(rate, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        # Session id -> futures of its waiting calls, oldest first; sessions in turn order
+        self._waiting = OrderedDict()
+        self._queued = 0
+        self._timer = None
+        self.admitted = 0
+        self.rejected = 0
+        self.max_depth = 0
+        # Recent queue wait times in seconds
+        self.waits = deque(maxlen=1000)
+
+    def _retry_after(self) -> int:
+        # Time to drain the queue at the configured rate, at least a second
+        if self.bucket.unlimited:
+            return 1
+        return max(1, math.ceil(self.bucket.wait_time() + self._queued / self.bucket.rate))
+
+    def _can_start(self) -> bool:
+        return self.in_flight < self.max_concurrent
+
+    def _next_waiter(self):
+        """Oldest waiter of the session whose turn it is, rotating that session to the back"""
+        while self._waiting:
+            session_id, futures = next(iter(self._waiting.items()))
+            future = futures.popleft()
+            self._queued -= 1
+            if futures:
+                self._waiting.move_to_end(session_id)
+            else:
+                del self._waiting[session_id]
+            if not future.done():
+                return future
+        return None
+
+    def _forget(self, session_id: str, future):
+        futures = self._waiting.get(session_id)
+        if futures is not None and future in futures:
+            futures.remove(future)
+            self._queued -= 1
+            if not futures:
+                del self._waiting[session_id]
+
+    def _dispatch(self):
+        """Start as many queued calls as the limits allow"""
+        self._timer = None
+        while self._waiting and self._can_start():
+            if not self.bucket.try_take():
+                # Come back when the next token is due
+                self._timer = asyncio.get_running_loop().call_later(self.bucket.wait_time(), self._dispatch)
+                return
+            future = self._next_waiter()
+            if future is None:
+                return
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self, session_id: str = ''):
+        if not self._waiting and self._can_start() and self.bucket.try_take():
+            self.in_flight += 1
+            self.admitted += 1
+            self.waits.append(0.0)
+            return
+
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(session_id, deque()).append(future)
+        self._queued += 1
+        self.max_depth = max(self.max_depth, self._queued)
+        if self._timer is None:
+            self._dispatch()
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as the wait ended: hand the slot back
+                self.release()
+            else:
+                future.cancel()
+                self._forget(session_id, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise AdmissionRejected(self._retry_after()) from None
+            raise
+        self.admitted += 1
+        self.waits.append(time.monotonic() - start)
+
+    def release(self):
+        self.in_flight -= 1
+        if self._timer is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, session_id: str = ''):
+        """Hold one model-call slot for the duration of the block"""
+        await self.acquire(session_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        samples = sorted(self.waits)
+        return {
+            'in_flight': self.in_flight,
+            'queue_depth': self._queued,
+            'max_queue_depth': self.max_depth,
+            'waiting_sessions': len(self._waiting),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'wait_avg_ms': round(sum(samples) / len(samples) * 1000, 1) if samples else 0.0,
+            'wait_p95_ms': round(samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000, 1) if samples else 0.0,
+        }
@@ -1,42 +1,205 @@
-from pydantic_ai import Agent as PydanticAgent
 import asyncio
 # import logfire  # Commented out - run without Logfire
 from dotenv import load_dotenv
 import os
 import json
 import hashlib
+import re
+import sys
+import threading
 import time
+from collections import OrderedDict
+from cart import normalize_name
+from history import ConversationHistory, CART_CONTEXT_HEADER
+from admission import AdmissionController, AdmissionRejected
+
+# Shared helpers live in common/ at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.resilience import ResilientCaller, RetryPolicy, CircuitOpenError, classify_error
+from common.metrics import REGISTRY
 
 load_dotenv(override=True)
 # logfire.configure()  # Commented out
 # logfire.instrument_pydantic_ai()  # Commented out
 
-# Get API key from environment - this will be automatically picked up by pydantic-ai
-google_api_key = os.getenv("GOOGLE_API_KEY")
+# "gemini" calls Google; "offline" uses the scripted stand-in in offline_model.py (no key needed)
+MODEL_BACKEND = os.getenv("SHOPSMART_MODEL_BACKEND", "gemini")
+
+
+def check_api_key():
+    """Validate GOOGLE_API_KEY before the Gemini backend is used"""
+    # Get API key from environment - this will be automatically picked up by pydantic-ai
+    google_api_key = os.getenv("GOOGLE_API_KEY")
 
-# Strip any whitespace or quotes that might have been added
-if google_api_key:
-    google_api_key = google_api_key.strip().strip('"').strip("'")
-    # Set it back to environment for pydantic-ai to use
-    os.environ["GOOGLE_API_KEY"] = google_api_key
+    # Strip any whitespace or quotes that might have been added
+    if google_api_key:
+        google_api_key = google_api_key.strip().strip('"').strip("'")
+        # Set it back to environment for pydantic-ai to use
+        os.environ["GOOGLE_API_KEY"] = google_api_key
 
-# Check if API key is set
-if not google_api_key:
-    raise ValueError(
-        "GOOGLE_API_KEY not found in environment variables. "
-        "Please check your .env file"
-    )
+    # Check if API key is set
+    if not google_api_key:
+        raise ValueError(
+            "GOOGLE_API_KEY not found in environment variables. "
+            "Please check your .env file"
+        )
 
-print(f"Using API key: {google_api_key[:10]}...{google_api_key[-4:] if len(google_api_key) > 14 else ''}")
+    # Validate API key format
+    if not google_api_key.startswith("AIza"):
+        raise ValueError(
+            f"Invalid Google API key format. Google API keys should start with 'AIza'. "
+            f"Your key starts with: {google_api_key[:4]}"
+        )
 
-# Validate API key format
-if not google_api_key.startswith("AIza"):
-    raise ValueError(
-        f"Invalid Google API key format. Google API keys should start with 'AIza'. "
-        f"Your key starts with: {google_api_key[:10]}"
-    )
 
 model = "gemini-2.5-flash"
+# Used when the primary model keeps failing or its circuit is open; empty disables fallback
+fallback_model = os.getenv("SHOPSMART_FALLBACK_MODEL", "gemini-2.0-flash")
+
+OVERLOADED_MESSAGE = "⚠️ The AI model is currently overloaded. Please try again in a moment."
+BUSY_MESSAGE = "⏳ ShopSmart is busy right now. Please retry in {retry_after} s."
+
+# Exposed by app.py at /metrics
+STAGE_SECONDS = REGISTRY.histogram(
+    "shopsmart_stage_seconds", "Time spent in each stage of handling a prompt", ("stage",))
+MODEL_CALLS = REGISTRY.counter("shopsmart_model_calls_total", "Model calls by outcome", ("outcome",))
+MODEL_RETRIES = REGISTRY.counter("shopsmart_model_retries_total", "Model call retries by error kind", ("kind",))
+MODEL_TOKENS = REGISTRY.counter("shopsmart_model_tokens_total", "Model tokens used", ("direction",))
+
+
+def record_usage(result):
+    """Count a finished run's input and output tokens"""
+    usage = result.usage()
+    MODEL_TOKENS.inc(usage.input_tokens or 0, direction="input")
+    MODEL_TOKENS.inc(usage.output_tokens or 0, direction="output")
+
+
+# Prompts that refer back to earlier turns can't be replayed as a cached action
+CONTEXT_DEPENDENT = re.compile(r"\b(it|them|that|those|this|these|more|another|again|same|last|previous)\b")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Cache key form of a prompt: lowercase, single spaces, no trailing punctuation"""
+    return re.sub(r'\s+', ' ', prompt).strip().lower().rstrip('.!?')
+
+
+def parse_action_response(response: str):
+    """Structured cart action from a model reply, or None for plain chat"""
+    try:
+        # Remove markdown code blocks if present
+        cleaned_response = response.strip()
+        if cleaned_response.startswith('```'):
+            lines = cleaned_response.split('\n')
+            cleaned_response = '\n'.join(lines[1:-1]).strip()
+
+        response_data = json.loads(cleaned_response)
+    except (json.JSONDecodeError, TypeError):
+        # Not JSON, regular chat message
+        return None
+    return response_data if isinstance(response_data, dict) else None
+
+
+def names_products(action: dict, prompt_key: str) -> bool:
+    """Whether the prompt names every product an add/remove action touches
+
+    "add 2 apples" does; "yes please" answered with an add action relies on
+    the conversation, so its action can't be replayed for anyone else.
+    """
+    if action.get('action') == 'add':
+        items = action.get('items')
+        names = [item.get('name') for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+    else:
+        names = [action.get('name')]
+    if not names:
+        return False
+    prompt_words = {normalize_name(word) for word in re.findall(r"[a-z0-9']+", prompt_key)}
+    for name in names:
+        if not isinstance(name, str) or not name:
+            return False
+        # Cart keys carry attributes in parentheses: "Apples (Red)"
+        words = re.findall(r"[a-z0-9']+", name.split(' (')[0].lower())
+        if not words or any(normalize_name(word) not in prompt_words for word in words):
+            return False
+    return True
+
+
+def merge_prompts(prompts) -> str:
+    """One message standing in for a burst of prompts sent close together"""
+    lines = '\n'.join(f"- {prompt}" for prompt in prompts)
+    # Worded to avoid CONTEXT_DEPENDENT words, so merged add actions stay cacheable
+    return ("Several messages arrived at once. Handle every message below in one reply, "
+            "combining all items to add into a single add action:\n" + lines)
+
+
+class ResponseCache:
+    """Bounded LRU cache of model replies with a time-to-live
+
+    Add/remove actions for the products a prompt names are stored per prompt
+    and replayed whatever the cart holds. Any other reply is only cached for
+    sessions without history, per prompt and cart fingerprint, since it may
+    depend on earlier turns. Prompts that refer back ("add another one") are
+    never cached.
+    """
+
+    ACTION = 'action'
+
+    def __init__(self, max_entries: int = 512, ttl: float = 900):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, response = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def lookup(self, prompt_key: str, cart_fingerprint: str, fresh: bool):
+        """Cached reply for a prompt, counting one hit or miss; fresh means the session has no history"""
+        response = None
+        if not CONTEXT_DEPENDENT.search(prompt_key):
+            response = self._get((prompt_key, self.ACTION))
+            if response is None and fresh:
+                response = self._get((prompt_key, cart_fingerprint))
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def store(self, prompt_key: str, cart_fingerprint: str, fresh: bool, response: str):
+        if CONTEXT_DEPENDENT.search(prompt_key):
+            return
+        action = parse_action_response(response)
+        if action and action.get('action') in ('add', 'remove') and names_products(action, prompt_key):
+            key = (prompt_key, self.ACTION)
+        elif fresh:
+            key = (prompt_key, cart_fingerprint)
+        else:
+            return
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+        }
+
 
 class Agent:
     def __init__(self):
@@ -88,57 +251,231 @@ class Agent:
 
             Always capitalize product names. Return JSON only for add/remove actions.
             """
-        self.agent = PydanticAgent(model, system_prompt=system_prompt)
-        self.message_history = []
+        self.system_prompt = system_prompt
+        # The pydantic_ai agent and its model client are built on first use (or by warm_up)
+        self._agent = None
+        self._build_lock = threading.Lock()
+        self.build_seconds = None
+        self.startup_error = None
+        self.history = ConversationHistory()
         self.user_preferences = {}  # Track user preferences over time
+        self.response_cache = ResponseCache(
+            max_entries=int(os.getenv("SHOPSMART_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("SHOPSMART_CACHE_TTL", "900")),
+        )
+        # Caps concurrent and per-second model calls across all sessions
+        self.admission = AdmissionController(
+            max_concurrent=int(os.getenv("SHOPSMART_MAX_CONCURRENT", "4")),
+            rate=float(os.getenv("SHOPSMART_RATE_LIMIT", "5")),
+            burst=int(os.getenv("SHOPSMART_RATE_BURST", "10")),
+            max_queue=int(os.getenv("SHOPSMART_MAX_QUEUE", "50")),
+        )
+        hedge_after = os.getenv("SHOPSMART_HEDGE_AFTER")
+        self.caller = ResilientCaller(
+            model,
+            # The offline stand-in has nothing to fall back to
+            fallback_model if MODEL_BACKEND != "offline" else None,
+            policy=RetryPolicy(
+                max_attempts=int(os.getenv("SHOPSMART_MAX_ATTEMPTS", "4")),
+                deadline=float(os.getenv("SHOPSMART_CALL_DEADLINE", "30")),
+            ),
+            hedge_after=float(hedge_after) if hedge_after else None,
+            on_retry=lambda kind: MODEL_RETRIES.inc(kind=kind.value),
+        )
+
+    def build(self):
+        """Import pydantic_ai and create the model client once; safe to call from any thread"""
+        with self._build_lock:
+            if self._agent is None:
+                started = time.perf_counter()
+                from pydantic_ai import Agent as PydanticAgent
+                if MODEL_BACKEND == "offline":
+                    from offline_model import offline_model
+                    self._agent = PydanticAgent(offline_model(), system_prompt=self.system_prompt)
+                else:
+                    check_api_key()
+                    self._agent = PydanticAgent(model, system_prompt=self.system_prompt)
+                self.build_seconds = time.perf_counter() - started
+                self.startup_error = None
+        return self._agent
+
+    @property
+    def agent(self):
+        return self.build()
+
+    @property
+    def ready(self) -> bool:
+        return self._agent is not None
+
+    async def ensure_ready(self):
+        """Build the agent off the event loop if it isn't built yet"""
+        if self._agent is None:
+            await asyncio.to_thread(self.build)
+
+    async def warm_up(self):
+        """Build the agent in the background at startup, recording (not raising) a failure"""
+        try:
+            await self.ensure_ready()
+        except Exception as e:
+            self.startup_error = e
+            print(f"❌ ShopSmart agent failed to start: {e}")
+            return
+        print(f"✅ ShopSmart agent ready ({MODEL_BACKEND} backend, {self.build_seconds:.2f}s)")
+
+    def _run(self, model_name: str, enhanced_message: str, message_history):
+        """One agent run on the given model (the agent's own model for the primary)"""
+        run_model = None if model_name == model else model_name
+        return self.agent.run(enhanced_message, message_history=message_history, model=run_model)
+
+    @staticmethod
+    def format_cart_context(cart_context) -> str:
+        """Cart listing appended to the user's message"""
+        if not cart_context:
+            return ""
+        cart_info = CART_CONTEXT_HEADER
+        for item_name, item in cart_context.items():
+            cart_info += f"- {item_name}: {item.quantity} item(s)\n"
+        return cart_info
     
-    async def get_response_async(self, user_message: str, cart_context: dict = None) -> str:
-        """Get a response from the AI agent asynchronously with retry logic"""
+    def _prepare(self, user_message: str, cart_context, session):
+        """History owner, message to send and cache key for one prompt"""
+        history_owner = session if session is not None else self
         # Add cart context to the message if available
-        if cart_context:
-            cart_info = "\n\nCurrent cart contents:\n"
-            if not cart_context:
-                cart_info += "Cart is empty"
-            else:
-                for item_name, item_data in cart_context.items():
-                    cart_info += f"- {item_name}: {item_data['quantity']} item(s)\n"
-            
-            enhanced_message = user_message + cart_info
-        else:
-            enhanced_message = user_message
-        
-        # Retry logic for handling 503 errors
-        max_retries = 3
-        retry_delay = 2  # Start with 2 seconds
-        
-        for attempt in range(max_retries):
-            try:
-                # Pass the message history to maintain context
-                response = await self.agent.run(enhanced_message, message_history=self.message_history)
-                
-                # Update message history with new messages from this run
-                self.message_history = response.all_messages()
-                
-                return response.output
-                
-            except Exception as e:
-                error_msg = str(e)
-                
-                # Check if it's a 503 error
-                if '503' in error_msg or 'overloaded' in error_msg.lower():
-                    if attempt < max_retries - 1:
-                        print(f"⚠️ Model overloaded, retrying in {retry_delay} seconds... (Attempt {attempt + 1}/{max_retries})")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-                        continue
-                    else:
-                        return "⚠️ The AI model is currently overloaded. Please try again in a moment."
-                else:
-                    # For other errors, raise immediately
-                    raise e
+        cart_info = self.format_cart_context(cart_context)
+        enhanced_message = user_message + cart_info
+
+        # The cache key covers exactly the cart text sent, and whether any history was
+        cart_fingerprint = hashlib.sha1(cart_info.encode()).hexdigest()
+        cache_key = (normalize_prompt(user_message), cart_fingerprint, not history_owner.history)
+        return history_owner, enhanced_message, cache_key
+
+    async def get_response_async(self, user_message: str, cart_context=None, session=None) -> str:
+        """Get a response from the AI agent asynchronously with retry logic
+
+        When a session is given, its own conversation history is used and updated
+        so concurrent shoppers never see each other's turns. The history is kept
+        to a token budget, see ConversationHistory.
+        """
+        history_owner, enhanced_message, cache_key = self._prepare(user_message, cart_context, session)
+
+        # Repeated prompts are answered from the cache
+        cached = self.response_cache.lookup(*cache_key)
+        if cached is not None:
+            # Still part of the conversation, so a follow-up like "add another one" can refer to it
+            history_owner.history.add_exchange(enhanced_message, cached, self.system_prompt)
+            return cached
+
+        # Only replies that need the model wait for it to be built
+        await self.ensure_ready()
         
-        return "⚠️ Unable to connect to AI service. Please try again later."
-    
+        # Retries, circuit breaking and fallback are handled by the caller
+        message_history = history_owner.history.messages
+        queued_at = time.perf_counter()
+        try:
+            async with self.admission.slot(getattr(session, 'session_id', '')):
+                STAGE_SECONDS.observe(time.perf_counter() - queued_at, stage="admission_wait")
+                # Includes retries and fallback; retries are also counted by kind
+                with STAGE_SECONDS.time(stage="model_call"):
+                    response = await self.caller.call(
+                        lambda model_name: self._run(model_name, enhanced_message, message_history)
+                    )
+        except AdmissionRejected as e:
+            MODEL_CALLS.inc(outcome="rejected")
+            return BUSY_MESSAGE.format(retry_after=e.retry_after)
+        except Exception as e:
+            if classify_error(e).retryable:
+                MODEL_CALLS.inc(outcome="overloaded")
+                return OVERLOADED_MESSAGE
+            MODEL_CALLS.inc(outcome="error")
+            raise
+        MODEL_CALLS.inc(outcome="ok")
+        record_usage(response)
+
+        # Update message history with new messages from this run, compacted to budget
+        history_owner.history.update(response.all_messages())
+
+        self.response_cache.store(*cache_key, response.output)
+        return response.output
+
+    async def stream_response(self, user_message: str, cart_context=None, session=None):
+        """Yield the reply as text deltas while the model generates it
+
+        Uses the same cache, history and retry/fallback policy as get_response_async;
+        retries only happen before the first delta has been yielded.
+        """
+        history_owner, enhanced_message, cache_key = self._prepare(user_message, cart_context, session)
+
+        cached = self.response_cache.lookup(*cache_key)
+        if cached is not None:
+            history_owner.history.add_exchange(enhanced_message, cached, self.system_prompt)
+            yield cached
+            return
+
+        await self.ensure_ready()
+
+        queued_at = time.perf_counter()
+        try:
+            await self.admission.acquire(getattr(session, 'session_id', ''))
+        except AdmissionRejected as e:
+            MODEL_CALLS.inc(outcome="rejected")
+            yield BUSY_MESSAGE.format(retry_after=e.retry_after)
+            return
+        started = time.perf_counter()
+        STAGE_SECONDS.observe(started - queued_at, stage="admission_wait")
+        # Until set otherwise the stream was abandoned, e.g. the browser went away
+        outcome = "cancelled"
+
+        # The slot is held until the stream finishes
+        try:
+            deadline = self.caller.new_deadline()
+            attempt = 0
+            while True:
+                chunks = []
+                try:
+                    model_name = self.caller.choose_model(attempt)
+                except CircuitOpenError:
+                    outcome = "overloaded"
+                    yield OVERLOADED_MESSAGE
+                    return
+                run_model = None if model_name == model else model_name
+                try:
+                    async with self.agent.run_stream(enhanced_message, message_history=history_owner.history.messages,
+                                                     model=run_model) as result:
+                        # No debouncing: each delta goes to the browser as soon as it arrives
+                        async for delta in result.stream_text(delta=True, debounce_by=None):
+                            chunks.append(delta)
+                            yield delta
+
+                    outcome = "ok"
+                    self.caller.record_success(model_name)
+                    record_usage(result)
+                    history_owner.history.update(result.all_messages())
+                    self.response_cache.store(*cache_key, ''.join(chunks))
+                    return
+
+                except Exception as e:
+                    self.caller.record_failure(model_name, e)
+                    # Once text has been sent a retry would repeat it, so only retry before that
+                    if chunks:
+                        outcome = "error"
+                        raise
+                    delay = self.caller.retry_delay(e, attempt, deadline)
+                    if delay is None:
+                        if classify_error(e).retryable:
+                            outcome = "overloaded"
+                            yield OVERLOADED_MESSAGE
+                            return
+                        outcome = "error"
+                        raise
+                    print(f"⚠️ {model_name} failed ({classify_error(e).value}), retrying in {delay:.1f}s... "
+                          f"(Attempt {attempt + 1}/{self.caller.policy.max_attempts})")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+        finally:
+            self.admission.release()
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="model_call")
+            MODEL_CALLS.inc(outcome=outcome)
+
     def get_response(self, user_message: str) -> str:
         """Synchronous wrapper for get_response_async"""
         return asyncio.run(self.get_response_async(user_message))
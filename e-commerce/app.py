@@ -1,28 +1,104 @@
 from fasthtml.common import *
-from agent import Agent
-import json
+from agent import Agent, MODEL_BACKEND, STAGE_SECONDS, parse_action_response, merge_prompts
+# common/ is importable once agent has put the repository root on the path
+from common.metrics import REGISTRY, CONTENT_TYPE
+from session_store import SessionStore
+from intent_parser import parse_intent, looks_like_add, KNOWN_PRODUCTS
+from catalog import ProductCatalog, default_catalog_path
+from cart import normalize_name
+from components import chat_history, chat_pair, streaming_reply, cart_contents, cart_snapshot, cart_updates
+from collections import deque
 from datetime import datetime
+import asyncio
+import html
+import os
+import re
+import time
 
-app, rt = fast_app()
+# Stream model replies token by token over Server-Sent Events
+STREAMING = os.getenv("SHOPSMART_STREAMING", "0") == "1"
 
-# Initialize agent
+# Add requests that pile up while a session's previous prompt runs go to the model as one call
+COALESCE = os.getenv("SHOPSMART_COALESCE", "0") == "1"
+MERGED_NOTE = "🧺 Handled together with your next message."
+# htmx holds a form's next request until the previous reply arrives, so with coalescing on
+# the chat form posts each prompt straight away and appends the replies in the order sent
+COALESCED_SUBMIT = (
+    "event.preventDefault();"
+    "const body = new FormData(this); this.reset();"
+    "const reply = fetch('/submit', {method: 'POST', body, headers: {'HX-Request': 'true'}}).then(r => r.text());"
+    "window.chatReplies = (window.chatReplies || Promise.resolve())"
+    ".then(() => reply).then(html => htmx.swap('#chat-result', html, {swapStyle: 'beforeend'}))"
+    ".catch(console.error);"
+)
+
+# Background tasks (batch flushes, agent warm-up) kept referenced until they finish
+background_tasks = set()
+
+# Initialize agent (cheap: the model client itself is built by warm_up or the first model call)
 agent = Agent()
+started_at = time.time()
+
+async def start_warm_up():
+    # Serve straight away and build the model client in the background; /readyz reports when it's done
+    task = asyncio.create_task(agent.warm_up())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def close_catalog():
+    # Learned prices are written behind; finish writing them before exiting
+    await catalog.close()
+
+app, rt = fast_app(hdrs=(Script(src="https://unpkg.com/htmx-ext-sse@2.2.2/sse.js"),) if STREAMING else None,
+                   on_startup=[start_warm_up], on_shutdown=[close_catalog])
+
+# Prices and colours learned from the agent, reused for every later add
+catalog = ProductCatalog(default_catalog_path(), seed=KNOWN_PRODUCTS)
 
-# Store messages as tuples (user_message, response, timestamp)
-messages = []
+# A prompt that states a price overrides the catalog's remembered one
+PRICE_MENTION = re.compile(r'\$\s*\d|\d\s*(?:dollars|bucks)\b|\b(?:for|at) \d|@\s*\d')
 
-# Store cart items with enhanced data
-cart = {}
+def user_priced(product_name, prompts):
+    """Whether the prompt that asked for this product stated its price
+
+    In a merged burst that's the prompt naming the product; if none does,
+    any stated price counts, so a user's price never reaches the catalog.
+    """
+    name = normalize_name(product_name)
+    asked = [prompt for prompt in prompts if name in normalize_name(prompt)] or prompts
+    return any(PRICE_MENTION.search(prompt) for prompt in asked)
+
+# Recent time-to-first-byte samples of streamed replies, in seconds
+stream_ttfb = deque(maxlen=1000)
+
+# Exposed at /metrics with the agent's model call metrics
+REQUEST_SECONDS = REGISTRY.histogram("shopsmart_request_seconds", "Time to answer a /submit request")
+ERRORS = REGISTRY.counter("shopsmart_errors_total", "Prompts answered with an error")
+STREAM_TTFB = REGISTRY.histogram("shopsmart_stream_ttfb_seconds", "Time to first byte of streamed replies")
+# Read from the live objects whenever /metrics is scraped
+CACHE_STATS = REGISTRY.gauge("shopsmart_reply_cache", "Reply cache hits, misses and entries", ("stat",))
+ADMISSION_STATS = REGISTRY.gauge("shopsmart_admission", "Model call slots in use and queued calls", ("stat",))
+SESSIONS = REGISTRY.gauge("shopsmart_sessions", "Shopper sessions in memory")
+
+# Per-browser carts, chat logs and conversation histories keyed by cookie session id
+sessions = SessionStore()
 
-# Add favorites system
-favorites = set()
 
 @rt('/')
-def get():
-    # Clear messages and cart on page load
-    global messages, cart
-    messages = []
-    cart = {}
+async def get(session):
+    # Render this shopper's full history once; /submit only appends to it
+    state = sessions.get(session)
+    cart = state.cart
+    # Taken together under the lock so a /submit for this session can't slip in between
+    async with state.lock:
+        total_items = cart.total_items
+        total_price = cart.total_price
+        message_count = len(state.messages)
+        chat_rows = chat_history(state.messages)
+        cart_rows = cart_contents(cart, agent.get_text_color)
+        # The full panel is rendered below, so pending partial updates are moot
+        cart.take_changes()
+        state.rendered_cart = cart_snapshot(cart)
 
     return Titled("🛍️ ShopSmart AI - Your Intelligent Shopping Assistant",
         Style("""
@@ -190,17 +266,17 @@ def get():
             Div(
                 Div(
                     Div("💬 Messages", cls='stat-label'),
-                    Div("0", id='msg-count', cls='stat-value'),
+                    Div(str(message_count), id='msg-count', cls='stat-value'),
                     cls='stat-card'
                 ),
                 Div(
                     Div("🛒 Cart Items", cls='stat-label'),
-                    Div("0", id='cart-count', cls='stat-value'),
+                    Div(str(total_items), id='cart-count', cls='stat-value'),
                     cls='stat-card'
                 ),
                 Div(
                     Div("💰 Total Price", cls='stat-label'),
-                    Div("$0.00", id='total-price', cls='stat-value'),
+                    Div(f"${total_price:.2f}", id='total-price', cls='stat-value'),
                     cls='stat-card'
                 ),
                 cls='stats-bar'
@@ -216,13 +292,7 @@ def get():
                     ),
                     Div(
                         Div(
-                            # Empty state for chat
-                            Div(
-                                Div("💭", cls='empty-state-icon'),
-                                Div("Start chatting with ShopSmart AI! - Try: 'add 3 red apples' or 'what's in my cart?'", cls='empty-state-text'),
-                                cls='empty-state',
-                                id='chat-empty'
-                            ),
+                            *chat_rows,
                             id='chat-result', 
                             style='flex: 1; overflow-y: auto; padding: 20px; border-radius: 0 0 14px 14px; max-height: calc(75vh - 140px); background: white;'
                         ),
@@ -239,13 +309,7 @@ def get():
                     ),
                     Div(
                         Div(
-                            # Empty state for cart
-                            Div(
-                                Div("🛍️", cls='empty-state-icon'),
-                                Div("Your cart is empty - Add items to get started!", cls='empty-state-text'),
-                                cls='empty-state',
-                                id='cart-empty'
-                            ),
+                            *cart_rows,
                             id='cart-result', 
                             style='flex: 1; overflow-y: auto; padding: 20px; background: white; border-radius: 0 0 14px 14px; max-height: calc(75vh - 140px);'
                         ),
@@ -279,212 +343,344 @@ def get():
                 ),
                 style='display: flex; align-items: center; max-width: 1400px; margin: 0 auto; width: 100%;'
             ),
-            hx_post='/submit',
-            hx_target='#chat-result',
-            hx_swap='innerHTML',
-            **{'hx-on::after-request': 'this.reset()'},
+            **({'onsubmit': COALESCED_SUBMIT} if COALESCE and not STREAMING else
+               {'hx_post': '/submit', 'hx_target': '#chat-result', 'hx_swap': 'beforeend',
+                'hx-on::after-request': 'this.reset()'}),
             style='position: fixed; bottom: 0; left: 0; right: 0; background: rgba(255,255,255,0.15); backdrop-filter: blur(20px); padding: 20px 30px; border-top: 1px solid rgba(255,255,255,0.25); box-shadow: 0 -5px 30px rgba(0,0,0,0.15); z-index: 1000;'
         )
     )
 
-@rt('/submit')
-async def post(prompt: str):
+def apply_action(cart, response_data, prompts=()):
+    """Apply an add/remove/total action to the cart and describe the result
+
+    `prompts` are the user messages the action answers. Returns None for
+    actions the cart doesn't understand.
+    """
+    action = response_data.get('action')
+
+    if action == 'add':
+        # Handle multiple items with price tracking
+        items = response_data.get('items', [])
+        added_items = []
+
+        for item in items:
+            product_name = item.get('name', 'Unknown')
+            quantity = item.get('quantity', 1)
+            color = item.get('color', '')
+            price = item.get('price', 0.0)  # Get price from AI
+
+            # Same product, same price: reuse the catalog's unless the user named one
+            priced = user_priced(product_name, prompts)
+            known = catalog.lookup(product_name)
+            if known is not None and known[1] is not None and not priced:
+                price = known[1]
+
+            # Validate and fallback to the stored (or generated once) color if invalid
+            if not color or not color.strip() or color.strip() == '#':
+                color = catalog.color_for(product_name, agent.generate_color_from_title)
+
+            attributes = item.get('attributes', '')
+            # A price the user named only applies to their cart line, never to everyone's catalog
+            catalog.record(product_name, None if priced else price, color, attributes)
+
+            # Update cart with price tracking
+            cart_key = cart.add(product_name, quantity, price, color, attributes)
+            added_items.append(f"{quantity} {cart_key}")
+
+        return f"✅ Added {', '.join(added_items)} to cart (Total: ${cart.total_price:.2f})"
+
+    if action == 'remove':
+        product_name = response_data.get('name', 'Unknown')
+        remove_quantity = response_data.get('quantity', 0)  # 0 means remove all
+
+        # Exact key or base-name match (could have attributes)
+        removed = cart.remove(product_name, remove_quantity)
+
+        if removed is None:
+            return f"❌ {product_name} not found in cart"
+        found_key, remaining = removed
+        if remaining == 0:
+            return f"🗑️ Removed {found_key} from cart"
+        return f"➖ Removed {remove_quantity} {found_key} (Remaining: {remaining})"
+
+    if action == 'total':
+        if not cart:
+            return "🛒 Your cart is empty"
+        lines = ', '.join(f"{item.quantity} {key}" for key, item in cart.items())
+        return f"🛒 {cart.total_items} item(s) in your cart: {lines} (Total: ${cart.total_price:.2f})"
+
+    return None
+
+def panel_updates(state):
+    """Out-of-band swaps for the cart lines touched since the last response and the stat counters"""
+    cart = state.cart
+    # Only cart lines touched by this request are compared and sent
+    cart_display = cart_updates(state.rendered_cart, cart, cart.take_changes(), agent.get_text_color)
+    return (
+        *cart_display,
+        Div(str(len(state.messages)), id='msg-count', hx_swap_oob='true', cls='stat-value'),
+        Div(str(cart.total_items), id='cart-count', hx_swap_oob='true', cls='stat-value'),
+        Div(f"${cart.total_price:.2f}", id='total-price', hx_swap_oob='true', cls='stat-value')
+    )
+
+def reply_display(state, prompt: str, chat_message, with_panel: bool = True):
+    """Log one exchange and build the response that appends it to the chat"""
+    # Add to messages with timestamp
+    timestamp = datetime.now().strftime("%I:%M %p")
+    state.messages.append((prompt, chat_message, timestamp))
+
+    # Building the components; FastHTML serializes them after the handler returns
+    with STAGE_SECONDS.time(stage="render"):
+        # Only the new message pair is sent; the client appends it to the log
+        chat_display = list(chat_pair(prompt, chat_message, timestamp))
+        if len(state.messages) == 1:
+            # First message of the session replaces the empty-state placeholder
+            chat_display.append(Div(id='chat-empty', hx_swap_oob='delete'))
+
+        # Return both chat and cart updates using out-of-band swaps
+        return (*chat_display, *panel_updates(state)) if with_panel else tuple(chat_display)
+
+def error_display(e: Exception):
+    ERRORS.inc()
+    print(f"Error in /submit: {e}")
+    import traceback
+    traceback.print_exc()
+    return Div(f"Error: {str(e)}", style='color: red; padding: 10px;')
+
+async def process_prompt(state, prompt: str):
+    """Run one prompt against a shopper's own cart and chat log"""
+    cart = state.cart
+
     try:
-        # Get response from agent asynchronously with cart context
-        response = await agent.get_response_async(prompt, cart_context=cart)
+        # Simple cart commands are parsed locally, skipping the model round trip
+        response = None
+        with STAGE_SECONDS.time(stage="intent_parse"):
+            response_data = parse_intent(prompt, catalog.lookup, cart)
+        if response_data is None and STREAMING:
+            return start_stream(state, prompt)
+        if response_data is None:
+            # Get response from agent asynchronously with cart context
+            response = await agent.get_response_async(prompt, cart_context=cart, session=state)
+            with STAGE_SECONDS.time(stage="json_parse"):
+                response_data = parse_action_response(response)
 
         # Process the response
-        chat_message = ""
+        with STAGE_SECONDS.time(stage="cart_mutation"):
+            chat_message = apply_action(cart, response_data, [prompt]) if response_data else None
+        if chat_message is None:
+            chat_message = response
+
+        return reply_display(state, prompt, chat_message)
+
+    except Exception as e:
+        return error_display(e)
+
+async def process_merged(state, prompts):
+    """Answer a burst of add requests with one agent call
+
+    The reply goes with the last prompt, whatever the model answered, and
+    earlier ones get a short note.
+    """
+    cart = state.cart
+    try:
+        response = await agent.get_response_async(merge_prompts(prompts), cart_context=cart, session=state)
+        with STAGE_SECONDS.time(stage="json_parse"):
+            response_data = parse_action_response(response)
+        with STAGE_SECONDS.time(stage="cart_mutation"):
+            chat_message = apply_action(cart, response_data, prompts) if response_data else None
+        if chat_message is None:
+            chat_message = response
+    except Exception as e:
+        return [error_display(e)] * len(prompts)
+
+    results = [reply_display(state, prompt, MERGED_NOTE, with_panel=False) for prompt in prompts[:-1]]
+    results.append(reply_display(state, prompts[-1], chat_message))
+    return results
+
+async def process_batch(state, prompts):
+    """Results for prompts that arrived together, in arrival order
+
+    Consecutive add requests that need the model are merged into a single call;
+    everything else (local commands, removals, questions) runs on its own.
+    """
+    results = []
+    run = []
+
+    async def flush_run():
+        if len(run) == 1:
+            results.append(await process_prompt(state, run[0]))
+        elif run:
+            results.extend(await process_merged(state, run))
+        run.clear()
+
+    for prompt in prompts:
+        if parse_intent(prompt, catalog.lookup, state.cart) is None and looks_like_add(prompt):
+            run.append(prompt)
+            continue
+        await flush_run()
+        results.append(await process_prompt(state, prompt))
+    await flush_run()
+    return results
+
+async def flush_batches(state):
+    """Run a session's queued prompts, then whatever piled up while they ran, answering each request"""
+    try:
+        while state.batch:
+            batch, state.batch = state.batch, []
+            try:
+                async with state.lock:
+                    results = await process_batch(state, [prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+    finally:
+        state.flushing = False
+
+async def submit_coalesced(state, prompt: str):
+    """Queue a prompt for the session and return its share of the result
+
+    An idle session runs it straight away; prompts that arrive meanwhile are
+    handled together once it finishes.
+    """
+    future = asyncio.get_running_loop().create_future()
+    state.batch.append((prompt, future))
+    if not state.flushing:
+        # The flush outlives this request, so a closed connection doesn't stop the other prompts
+        state.flushing = True
+        task = asyncio.ensure_future(flush_batches(state))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    return await future
+
+def start_stream(state, prompt: str):
+    """Show the user's message now and open an SSE stream for the reply"""
+    turn_id = state.add_pending_stream(prompt)
+    timestamp = datetime.now().strftime("%I:%M %p")
+    chat_display = list(chat_pair(prompt, streaming_reply(f'/stream/{turn_id}', f'reply-{turn_id}'), timestamp))
+    if not state.messages:
+        chat_display.append(Div(id='chat-empty', hx_swap_oob='delete'))
+    return tuple(chat_display)
+
+async def stream_reply(state, prompt: str):
+    """SSE events for one streamed reply; cart actions apply as soon as their JSON parses"""
+    if prompt is None:
+        yield sse_message(Span("⚠️ This reply is no longer available."), event='final')
+        yield sse_message('', event='done')
+        return
+
+    async with state.lock:
+        cart = state.cart
+        start = time.perf_counter()
+        first_byte = None
+        chunks = []
+        structured = None  # Unknown until the first non-blank character arrives
+        chat_message = None
+
         try:
-            # Remove markdown code blocks if present
-            cleaned_response = response.strip()
-            if cleaned_response.startswith('```'):
-                lines = cleaned_response.split('\n')
-                cleaned_response = '\n'.join(lines[1:-1]).strip()
-
-            response_data = json.loads(cleaned_response)
-            action = response_data.get('action')
-
-            if action == 'add':
-                # Handle multiple items with price tracking
-                items = response_data.get('items', [])
-                added_items = []
-
-                for item in items:
-                    product_name = item.get('name', 'Unknown')
-                    quantity = item.get('quantity', 1)
-                    color = item.get('color', '')
-                    price = item.get('price', 0.0)  # Get price from AI
-
-                    # Validate and fallback to generated color if invalid
-                    if not color or not color.strip() or color.strip() == '#':
-                        color = agent.generate_color_from_title(product_name)
-
-                    attributes = item.get('attributes', '')
-
-                    # Create unique key with attributes if present
-                    cart_key = f"{product_name} ({attributes})" if attributes else product_name
-
-                    # Update cart with price tracking
-                    if cart_key in cart:
-                        cart[cart_key]['quantity'] += quantity
-                    else:
-                        cart[cart_key] = {'quantity': quantity, 'color': color, 'price': price}
-
-                    added_items.append(f"{quantity} {cart_key}")
-
-                # Calculate total
-                total_price = sum(item['quantity'] * item.get('price', 0) for item in cart.values())
-                chat_message = f"✅ Added {', '.join(added_items)} to cart (Total: ${total_price:.2f})"
-
-            elif action == 'remove':
-                product_name = response_data.get('name', 'Unknown')
-                remove_quantity = response_data.get('quantity', 0)  # 0 means remove all
-
-                # Find matching product in cart (could have attributes)
-                found_key = None
-                for key in cart.keys():
-                    if key.startswith(product_name):
-                        found_key = key
-                        break
-
-                # Remove from cart
-                if found_key:
-                    current_quantity = cart[found_key]['quantity']
-
-                    if remove_quantity == 0 or remove_quantity >= current_quantity:
-                        # Remove entire item
-                        del cart[found_key]
-                        chat_message = f"🗑️ Removed {found_key} from cart"
-                    else:
-                        # Reduce quantity
-                        cart[found_key]['quantity'] -= remove_quantity
-                        chat_message = f"➖ Removed {remove_quantity} {found_key} (Remaining: {cart[found_key]['quantity']})"
-                else:
-                    chat_message = f"❌ {product_name} not found in cart"
-            else:
+            async for delta in agent.stream_response(prompt, cart_context=cart, session=state):
+                chunks.append(delta)
+                text = ''.join(chunks).lstrip()
+                if structured is None and text:
+                    # JSON actions are applied, not shown, so they aren't streamed as text
+                    structured = text.startswith('{') or text.startswith('```')
+
+                if structured is False:
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - start
+                    yield sse_message(html.escape(delta), event='token')
+                elif structured and chat_message is None:
+                    response_data = parse_action_response(text)
+                    if response_data:
+                        with STAGE_SECONDS.time(stage="cart_mutation"):
+                            chat_message = apply_action(cart, response_data, [prompt])
+
+            response = ''.join(chunks)
+            if chat_message is None:
                 chat_message = response
+        except Exception as e:
+            print(f"Error in /stream: {e}")
+            import traceback
+            traceback.print_exc()
+            chat_message = f"Error: {str(e)}"
 
-        except (json.JSONDecodeError, TypeError):
-            # Not JSON, regular chat message
-            chat_message = response
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        stream_ttfb.append(first_byte)
+        STREAM_TTFB.observe(first_byte)
 
-        # Add to messages with timestamp
         timestamp = datetime.now().strftime("%I:%M %p")
-        messages.append((prompt, chat_message, timestamp))
+        state.messages.append((prompt, chat_message, timestamp))
+        yield sse_message((Span(chat_message), *panel_updates(state)), event='final')
+        yield sse_message('', event='done')
 
-        # Build chat display with modern styling
-        chat_display = []
-        for user_msg, bot_msg, time_str in messages:
-            # User message - right aligned with gradient background
-            chat_display.append(
-                Div(
-                    Div(
-                        Div(user_msg, style='margin-bottom: 6px; font-weight: 500; line-height: 1.5;'),
-                        Div(time_str, style='font-size: 10px; opacity: 0.8; text-align: right;'),
-                        style='display: inline-block; padding: 16px 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border-radius: 24px 24px 6px 24px; max-width: 75%; word-wrap: break-word; box-shadow: 0 4px 12px rgba(102,126,234,0.4);'
-                    ),
-                    style='text-align: right; margin-bottom: 16px; animation: slideIn 0.3s ease-out;'
-                )
-            )
-            # Bot message - left aligned with card style
-            chat_display.append(
-                Div(
-                    Div(
-                        Div(
-                            Div("🤖", style='font-size: 20px;'),
-                            Div("ShopSmart AI", style='font-weight: 700; color: #667eea;'),
-                            style='display: flex; align-items: center; gap: 8px; margin-bottom: 8px; padding-bottom: 8px; border-bottom: 2px solid #f0f0f0;'
-                        ),
-                        Div(bot_msg, style='margin-bottom: 8px; line-height: 1.6; color: #2d3748; font-size: 15px;'),
-                        Div(time_str, style='font-size: 10px; opacity: 0.5; text-align: left;'),
-                        style='display: inline-block; padding: 18px 22px; background: linear-gradient(to bottom, #ffffff 0%, #f8f9ff 100%); color: #2d3748; border-radius: 24px 24px 24px 6px; max-width: 75%; word-wrap: break-word; box-shadow: 0 4px 12px rgba(0,0,0,0.08); border: 2px solid #f0f0f0;'
-                    ),
-                    style='text-align: left; margin-bottom: 20px; animation: slideIn 0.3s ease-out;'
-                )
-            )
+@rt('/stream/{turn_id}')
+def get(turn_id: str, session):
+    state = sessions.get(session)
+    return EventStream(stream_reply(state, state.take_pending_stream(turn_id)))
 
-        # Return both chat and cart updates using out-of-band swaps
-        cart_display = []
-        total_items = sum(item['quantity'] for item in cart.values())
-        total_price = sum(item['quantity'] * item.get('price', 0) for item in cart.values())
-        
-        # Add total price banner with enhanced styling
-        if cart:
-            cart_display.append(
-                Div(
-                    Div(
-                        Div("💰", style='font-size: 28px; margin-right: 12px;'),
-                        Div(
-                            Div("Cart Total", style='font-size: 13px; opacity: 0.9; text-transform: uppercase; letter-spacing: 1px;'),
-                            Div(f"${total_price:.2f}", style='font-size: 28px; font-weight: 800; margin-top: 4px;'),
-                            style='flex: 1;'
-                        ),
-                        style='display: flex; align-items: center; color: white;'
-                    ),
-                    style='background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); padding: 20px 24px; border-radius: 16px; margin-bottom: 20px; box-shadow: 0 6px 20px rgba(56, 239, 125, 0.4); animation: pulse 2s infinite;'
-                )
-            )
-        
-        for product_name, item_data in cart.items():
-            quantity = item_data['quantity']
-            bg_color = item_data['color']
-            price = item_data.get('price', 0)
-            item_total = quantity * price
-            text_color = agent.get_text_color(bg_color)
-            
-            cart_display.append(
-                Div(
-                    Div(
-                        Div(
-                            Div("🏷️", style=f'font-size: 24px; margin-right: 12px; color: {text_color};'),
-                            Div(
-                                Div(product_name, style=f'font-weight: 700; font-size: 18px; color: {text_color}; margin-bottom: 4px;'),
-                                Div(
-                                    Div(
-                                        Div("Qty", style=f'font-size: 11px; opacity: 0.8; text-transform: uppercase; color: {text_color};'),
-                                        Div(str(quantity), style=f'font-size: 20px; font-weight: 700; color: {text_color};'),
-                                    ),
-                                    Div(
-                                        Div("Price", style=f'font-size: 11px; opacity: 0.8; text-transform: uppercase; color: {text_color}; text-align: right;'),
-                                        Div(f'${item_total:.2f}', style=f'font-size: 20px; font-weight: 700; color: {text_color};'),
-                                    ),
-                                    style='display: flex; justify-content: space-between; gap: 20px; margin-top: 8px;'
-                                ),
-                                style='flex: 1;'
-                            ),
-                            style='display: flex; align-items: center;'
-                        ),
-                        style=f'padding: 20px 24px; background: linear-gradient(135deg, {bg_color} 0%, {bg_color}dd 100%); border-radius: 16px;'
-                    ),
-                    style='margin-bottom: 16px;',
-                    cls='cart-item'
-                )
-            )
-
-        return Div(
-            Div(*chat_display) if chat_display else Div(
-                Div("💭", cls='empty-state-icon'),
-                Div("Start chatting with ShopSmart AI! - Try: 'add 3 red apples' or 'what's in my cart?'", cls='empty-state-text'),
-                cls='empty-state'
-            ),
-            Div(id='cart-result', hx_swap_oob='true', *(cart_display if cart_display else [
-                Div(
-                    Div("🛍️", cls='empty-state-icon'),
-                    Div("Your cart is empty - Add items to get started!", cls='empty-state-text'),
-                    cls='empty-state'
-                )
-            ])),
-            Div(str(len(messages)), id='msg-count', hx_swap_oob='true', cls='stat-value'),
-            Div(str(total_items), id='cart-count', hx_swap_oob='true', cls='stat-value'),
-            Div(f"${total_price:.2f}", id='total-price', hx_swap_oob='true', cls='stat-value')
-        )
+@rt('/stream-stats')
+def get():
+    # Time to first byte of streamed replies, in milliseconds
+    samples = sorted(stream_ttfb)
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'ttfb_p50_ms': round(samples[len(samples) // 2] * 1000, 1),
+        'ttfb_p95_ms': round(samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000, 1),
+        'ttfb_last_ms': round(stream_ttfb[-1] * 1000, 1),
+    }
 
-    except Exception as e:
-        print(f"Error in /submit: {e}")
-        import traceback
-        traceback.print_exc()
-        return Div(f"Error: {str(e)}", style='color: red; padding: 10px;')
+@rt('/cache-stats')
+def get():
+    # Hit/miss counters for tuning SHOPSMART_CACHE_SIZE / SHOPSMART_CACHE_TTL
+    return agent.response_cache.stats()
+
+@rt('/admission-stats')
+def get():
+    # Model-call slots in use, queue depth and queue wait times
+    return agent.admission.stats()
+
+@rt('/healthz')
+def get():
+    # Liveness: the process is up and serving, whether or not the model client is built yet
+    return {'status': 'alive', 'uptime_s': round(time.time() - started_at, 1)}
+
+@rt('/readyz')
+def get():
+    # Readiness: 200 once the agent can call the model, 503 while it's starting or if it failed
+    if agent.ready:
+        return {'status': 'ready', 'backend': MODEL_BACKEND, 'agent_build_s': round(agent.build_seconds, 3)}
+    if agent.startup_error is not None:
+        return JSONResponse({'status': 'failed', 'error': str(agent.startup_error)}, status_code=503)
+    return JSONResponse({'status': 'starting'}, status_code=503)
+
+@rt('/metrics')
+def get():
+    # Prometheus text format: stage/request histograms, model calls, retries and tokens
+    cache = agent.response_cache.stats()
+    for stat in ('hits', 'misses', 'entries'):
+        CACHE_STATS.set(cache[stat], stat=stat)
+    admission = agent.admission.stats()
+    for stat in ('in_flight', 'queue_depth', 'waiting_sessions', 'admitted', 'rejected'):
+        ADMISSION_STATS.set(admission[stat], stat=stat)
+    SESSIONS.set(len(sessions))
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@rt('/submit')
+async def post(prompt: str, session):
+    state = sessions.get(session)
+    with REQUEST_SECONDS.time():
+        if COALESCE and not STREAMING:
+            return await submit_coalesced(state, prompt)
+        # Requests from the same browser run one at a time; other sessions never wait
+        async with state.lock:
+            return await process_prompt(state, prompt)
 
 serve(port=5004)
 
@@ -0,0 +1,66 @@
+"""Compare cart panel payloads: full re-render vs diffed out-of-band updates.
+
+Each iteration changes the quantity of one line, which is what a typical
+"add 1 more" request does. Run from the e-commerce folder:
+    python benchmarks/bench_cart_updates.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fasthtml.common import to_xml
+from cart import Cart
+from components import cart_contents, cart_snapshot, cart_updates
+
+CART_SIZES = [10, 100, 250, 500]
+REPEATS = 20
+
+
+def text_color_for(bg_color):
+    """Same luminance rule as Agent.get_text_color without importing the agent"""
+    hex_color = bg_color.lstrip('#')
+    r, g, b = (int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+    return '#000000' if (0.299 * r + 0.587 * g + 0.114 * b) / 255 > 0.5 else '#FFFFFF'
+
+
+def build_cart(size):
+    cart = Cart()
+    for i in range(size):
+        cart.add(f"Product {i}", i % 4 + 1, 1.5 + i % 20, f'#{(i * 2654435761) & 0xFFFFFF:06x}', 'Size M')
+    return cart
+
+
+def measure(render):
+    """Median seconds and payload size of one render"""
+    timings = []
+    payload = ""
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        payload = render()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], len(payload.encode())
+
+
+def main():
+    print(f"{'lines':>6} | {'full bytes':>11} | {'full ms':>8} | {'diff bytes':>10} | {'diff ms':>8}")
+    print("-" * 55)
+    for size in CART_SIZES:
+        cart = build_cart(size)
+        full_time, full_bytes = measure(lambda: to_xml(cart_contents(cart, text_color_for)))
+
+        rendered = cart_snapshot(cart)
+        cart.take_changes()
+
+        def diff_render():
+            cart.add("Product 0", 1, attributes='Size M')
+            return to_xml(cart_updates(rendered, cart, cart.take_changes(), text_color_for))
+
+        diff_time, diff_bytes = measure(diff_render)
+        print(f"{size:>6} | {full_bytes:>11,} | {full_time * 1000:>8.2f} | {diff_bytes:>10,} | {diff_time * 1000:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare per-request /submit chat payloads: full re-render vs append-only.
+
+Run from the e-commerce folder:
+    python benchmarks/bench_chat_render.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fasthtml.common import to_xml
+from components import chat_history, chat_pair
+
+HISTORY_LENGTHS = [10, 100, 250, 500, 1000]
+REPEATS = 20
+
+
+def build_messages(count):
+    """Synthetic chat log with a realistic mix of cart actions and chat replies"""
+    messages = []
+    for i in range(count):
+        if i % 3 == 0:
+            messages.append((f"add {i % 5 + 1} red apples", f"✅ Added {i % 5 + 1} Apples to cart (Total: ${i * 3.99:.2f})", "10:15 AM"))
+        elif i % 3 == 1:
+            messages.append(("remove bananas", "🗑️ Removed Bananas from cart", "10:16 AM"))
+        else:
+            messages.append(("what's my total?", "You have 12 items in your cart totalling $48.20. Consider swapping the laptop for a refurbished one.", "10:17 AM"))
+    return messages
+
+
+def measure(render):
+    """Median seconds and payload size of one render"""
+    timings = []
+    payload = ""
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        payload = render()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], len(payload.encode())
+
+
+def main():
+    print(f"{'messages':>9} | {'full bytes':>11} | {'full ms':>8} | {'append bytes':>12} | {'append ms':>9}")
+    print("-" * 62)
+    for count in HISTORY_LENGTHS:
+        messages = build_messages(count)
+        user_msg, bot_msg, time_str = messages[-1]
+
+        full_time, full_bytes = measure(lambda: to_xml(chat_history(messages)))
+        append_time, append_bytes = measure(lambda: to_xml(chat_pair(user_msg, bot_msg, time_str)))
+
+        print(f"{count:>9} | {full_bytes:>11,} | {full_time * 1000:>8.2f} | {append_bytes:>12,} | {append_time * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
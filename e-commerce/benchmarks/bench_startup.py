@@ -0,0 +1,33 @@
+"""Measure ShopSmart's cold start: importing app, then building the agent's model client.
+
+Each run is a fresh interpreter. The server starts accepting requests once app
+is imported (liveness, /healthz); the model client is built in the background
+afterwards (readiness, /readyz). Pass --budget-ms to fail when the import
+regresses. Run from the e-commerce folder:
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 600
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from common.startup import measure, print_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to take the median of")
+    parser.add_argument("--backend", default="offline", choices=["offline", "gemini"],
+                        help="model backend to build (gemini needs GOOGLE_API_KEY)")
+    parser.add_argument("--budget-ms", type=float, help="exit 1 if importing app takes longer than this")
+    args = parser.parse_args()
+
+    env = {"SHOPSMART_MODEL_BACKEND": args.backend}
+    result = measure(ROOT, "app", "app.agent.build()", runs=args.runs, env=env)
+    sys.exit(print_report(result, args.budget_ms))
+
+
+if __name__ == "__main__":
+    main()
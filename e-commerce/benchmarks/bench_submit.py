@@ -0,0 +1,130 @@
+"""Load-test /submit with concurrent simulated shoppers against the offline model.
+
+No API key or quota is used: the app runs in-process with
+SHOPSMART_MODEL_BACKEND=offline. Reports requests/s and latency percentiles
+for N concurrent sessions, then response bytes as one session's cart and
+history grow. Admission limits apply as configured; raise
+SHOPSMART_MAX_CONCURRENT / SHOPSMART_RATE_LIMIT to measure the app rather
+than the limiter. Run from the e-commerce folder:
+    python benchmarks/bench_submit.py --sessions 50 --requests 10 --latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CART_SIZES = [10, 50, 100, 200]
+
+# Mix of locally parsed commands and prompts that need the model; {s} makes products per-session
+PROMPTS = [
+    "add 2 apples",
+    "add a hand-woven basket {s}",
+    "what goes well with pasta?",
+    "add 3 bananas and a loaf of bread",
+    "add two ceramic mugs {s} and a teapot {s}",
+    "remove the teapot {s}",
+    "what's my total?",
+    "suggest a healthy breakfast",
+]
+
+
+def product_name(n):
+    """Distinct letters-only product names ("widget ab model"), which the local parser accepts"""
+    letters = ''
+    while True:
+        letters = chr(ord('a') + n % 26) + letters
+        n //= 26
+        if n == 0:
+            return f"widget {letters} model"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def shopper(app, index, requests, latencies, sizes):
+    import httpx
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get("/")
+        for i in range(requests):
+            prompt = PROMPTS[(index + i) % len(PROMPTS)].format(s=index)
+            start = time.perf_counter()
+            response = await client.post("/submit", data={"prompt": prompt})
+            latencies.append(time.perf_counter() - start)
+            sizes.append(len(response.content))
+
+
+async def throughput(app, sessions, requests):
+    latencies, sizes = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(shopper(app, i, requests, latencies, sizes) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{sessions} sessions x {requests} requests in {elapsed:.2f}s")
+    print(f"  {len(latencies) / elapsed:.1f} req/s | p50 {percentile(latencies, 0.5) * 1000:.0f} ms | "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms | p99 {percentile(latencies, 0.99) * 1000:.0f} ms | "
+          f"avg {sum(sizes) / len(sizes):,.0f} bytes")
+
+
+async def growth(shop):
+    """Response bytes and latency as one session's cart and history grow
+
+    "chat" is the session's chat log; "history" is the messages (and their
+    estimated tokens) sent to the model with the next prompt.
+    """
+    import httpx
+    print(f"\n{'lines':>6} | {'chat':>5} | {'history':>7} | {'hist tok':>8} | {'add bytes':>9} | {'add ms':>7} | "
+          f"{'chat bytes':>10} | {'chat ms':>7} | {'page bytes':>10}")
+    print("-" * 100)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=shop.app), base_url="http://bench") as client:
+        await client.get("/")
+        # This client's session is the one used most recently
+        state = next(reversed(shop.sessions._sessions.values()))
+        lines = 0
+        for size in CART_SIZES:
+            while lines < size - 1:
+                # A stated price keeps these adds local, so the cart grows quickly
+                await client.post("/submit", data={"prompt": f"add 1 {product_name(lines)} for $2"})
+                lines += 1
+
+            start = time.perf_counter()
+            add = await client.post("/submit", data={"prompt": f"add 1 {product_name(lines)} for $2"})
+            add_ms = (time.perf_counter() - start) * 1000
+            lines += 1
+
+            start = time.perf_counter()
+            chat = await client.post("/submit", data={"prompt": f"any tips for a cart of {size} things?"})
+            chat_ms = (time.perf_counter() - start) * 1000
+
+            page = await client.get("/")
+            print(f"{size:>6} | {len(state.messages):>5} | {len(state.history):>7} | {state.history.token_estimate():>8,} | "
+                  f"{len(add.content):>9,} | {add_ms:>7.1f} | {len(chat.content):>10,} | {chat_ms:>7.1f} | {len(page.content):>10,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent simulated shoppers")
+    parser.add_argument("--requests", type=int, default=8, help="prompts sent by each shopper")
+    parser.add_argument("--latency", type=float, default=0.3, help="offline model time to first token (s)")
+    args = parser.parse_args()
+
+    os.environ["SHOPSMART_MODEL_BACKEND"] = "offline"
+    os.environ["SHOPSMART_OFFLINE_LATENCY"] = str(args.latency)
+    # Keep learned prices out of the real catalog
+    os.environ.setdefault("SHOPSMART_CATALOG_PATH", os.path.join(tempfile.mkdtemp(), "bench_catalog.db"))
+
+    import app as shop
+
+    asyncio.run(throughput(shop.app, args.sessions, args.requests))
+    asyncio.run(growth(shop))
+    print(f"\nadmission: {shop.agent.admission.stats()}")
+    print(f"cache: {shop.agent.response_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
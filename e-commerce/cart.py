@@ -0,0 +1,125 @@
+import re
+
+
+def normalize_name(name: str) -> str:
+    """Base product name used for lookups: lowercase, single spaces, naive singular"""
+    normalized = re.sub(r'\s+', ' ', name).strip().lower()
+    if normalized.endswith('s') and not normalized.endswith('ss'):
+        normalized = normalized[:-1]
+    return normalized
+
+
+class CartItem:
+    """One cart line; prices are kept in cents so running totals never drift"""
+    __slots__ = ('name', 'attributes', 'quantity', 'price_cents', 'color')
+
+    def __init__(self, name: str, attributes: str, quantity: int, price: float, color: str):
+        self.name = name
+        self.attributes = attributes
+        self.quantity = quantity
+        self.price_cents = round(price * 100)
+        self.color = color
+
+    @property
+    def price(self) -> float:
+        return self.price_cents / 100
+
+
+class Cart:
+    """Shopping cart with running totals and a base-name index for exact removal"""
+
+    def __init__(self):
+        # Display key ("Top (Purple, Size M)") -> CartItem, in insertion order
+        self._items = {}
+        # Normalized base name -> display keys of its attribute variants, oldest first
+        self._variants = {}
+        self._total_items = 0
+        self._total_cents = 0
+        # Keys touched since the last take_changes(), used for partial re-renders
+        self._changed = set()
+
+    @staticmethod
+    def make_key(name: str, attributes: str = '') -> str:
+        """Create unique key with attributes if present"""
+        return f"{name} ({attributes})" if attributes else name
+
+    def add(self, name: str, quantity: int = 1, price: float = 0.0, color: str = '', attributes: str = '') -> str:
+        """Add a quantity of a product, merging with an identical line if present"""
+        key = self.make_key(name, attributes)
+        item = self._items.get(key)
+        if item is not None:
+            item.quantity += quantity
+        else:
+            item = CartItem(name, attributes, quantity, price, color)
+            self._items[key] = item
+            self._variants.setdefault(normalize_name(name), {})[key] = None
+        self._total_items += quantity
+        self._total_cents += quantity * item.price_cents
+        self._changed.add(key)
+        return key
+
+    def find(self, name: str):
+        """Display key for a product name, exact key first, then its oldest variant"""
+        if name in self._items:
+            return name
+        variants = self._variants.get(normalize_name(name))
+        if variants:
+            return next(iter(variants))
+        return None
+
+    def remove(self, name: str, quantity: int = 0):
+        """Remove a quantity (0 means all) of a product.
+
+        Returns (key, remaining quantity) or None if the product isn't in the cart.
+        """
+        key = self.find(name)
+        if key is None:
+            return None
+
+        item = self._items[key]
+        if quantity == 0 or quantity >= item.quantity:
+            removed = item.quantity
+            remaining = 0
+            del self._items[key]
+            base = normalize_name(item.name)
+            variants = self._variants[base]
+            del variants[key]
+            if not variants:
+                del self._variants[base]
+        else:
+            removed = quantity
+            item.quantity -= quantity
+            remaining = item.quantity
+
+        self._total_items -= removed
+        self._total_cents -= removed * item.price_cents
+        self._changed.add(key)
+        return key, remaining
+
+    def take_changes(self) -> set:
+        """Return and clear the keys added, changed or removed since the last call"""
+        changed, self._changed = self._changed, set()
+        return changed
+
+    @property
+    def total_items(self) -> int:
+        return self._total_items
+
+    @property
+    def total_price(self) -> float:
+        return self._total_cents / 100
+
+    def get(self, key: str):
+        return self._items.get(key)
+
+    def items(self):
+        return self._items.items()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cart import normalize_name
+
+
+class ProductCatalog:
+    """SQLite record of the price, colour and attributes chosen for each product
+
+    Lookups are served from an in-memory copy. Writes are write-behind: rows
+    recorded while the background writer is busy are committed together on its
+    thread, so the event loop never waits on disk. Outside an event loop they
+    are written straight away.
+    """
+
+    def __init__(self, path: str, seed: dict = None):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS products (
+                key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                price REAL,
+                color TEXT,
+                attributes TEXT,
+                updated_at REAL
+            )"""
+        )
+        if seed:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO products VALUES (?, ?, ?, ?, '', ?)",
+                [(key, name, price, color, now) for key, (name, price, color) in seed.items()],
+            )
+        self._conn.commit()
+
+        # Normalized name -> (display name, price, color)
+        self._products = {
+            key: (name, price, color)
+            for key, name, price, color in self._conn.execute("SELECT key, name, price, color FROM products")
+        }
+
+        # Rows recorded but not yet on disk, by key
+        self._unsaved = {}
+        self._unsaved_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-writer")
+        self._pending = set()
+
+    def lookup(self, name: str):
+        """(display name, price, color) for a known product, or None"""
+        return self._products.get(normalize_name(name))
+
+    def record(self, name: str, price=None, color: str = '', attributes: str = ''):
+        """Remember a product the agent priced, keeping any values already learned"""
+        key = normalize_name(name)
+        known = self._products.get(key)
+        if known is not None:
+            known_name, known_price, known_color = known
+            price = known_price if known_price is not None else price
+            color = known_color or color
+            name = known_name
+            if (name, price, color) == known:
+                return
+        self._products[key] = (name, price, color)
+        with self._unsaved_lock:
+            # Rows joining a non-empty batch go out with the write already queued for it
+            queued = bool(self._unsaved)
+            self._unsaved[key] = (key, name, price, color, attributes, time.time())
+        if not queued:
+            self._queue_write()
+
+    def _queue_write(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_unsaved()
+            return
+        future = loop.run_in_executor(self._executor, self._write_unsaved)
+        self._pending.add(future)
+        future.add_done_callback(self._finished)
+
+    def _finished(self, future):
+        self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            print(f"❌ Error saving catalog: {future.exception()}")
+
+    def _write_unsaved(self):
+        with self._unsaved_lock:
+            rows, self._unsaved = list(self._unsaved.values()), {}
+        if rows:
+            self._conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    async def flush(self):
+        """Wait until every recorded product is on disk"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    async def close(self):
+        await self.flush()
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+    def color_for(self, name: str, generate):
+        """Stored colour for a product, generating and storing one the first time"""
+        known = self.lookup(name)
+        if known is not None and known[2]:
+            return known[2]
+        color = generate(name)
+        self.record(name, None if known is None else known[1], color)
+        return color
+
+    def __len__(self):
+        return len(self._products)
+
+
+def default_catalog_path() -> str:
+    return os.getenv(
+        "SHOPSMART_CATALOG_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "product_catalog.db"),
+    )
@@ -0,0 +1,207 @@
+from fasthtml.common import *
+from functools import lru_cache
+import hashlib
+
+
+def chat_empty_state():
+    """Placeholder shown until the first message of a session"""
+    return Div(
+        Div("💭", cls='empty-state-icon'),
+        Div("Start chatting with ShopSmart AI! - Try: 'add 3 red apples' or 'what's in my cart?'", cls='empty-state-text'),
+        cls='empty-state',
+        id='chat-empty'
+    )
+
+
+def chat_pair(user_msg, bot_msg, time_str):
+    """Render one user message and its bot reply as two chat bubbles"""
+    # User message - right aligned with gradient background
+    user_bubble = Div(
+        Div(
+            Div(user_msg, style='margin-bottom: 6px; font-weight: 500; line-height: 1.5;'),
+            Div(time_str, style='font-size: 10px; opacity: 0.8; text-align: right;'),
+            style='display: inline-block; padding: 16px 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border-radius: 24px 24px 6px 24px; max-width: 75%; word-wrap: break-word; box-shadow: 0 4px 12px rgba(102,126,234,0.4);'
+        ),
+        style='text-align: right; margin-bottom: 16px; animation: slideIn 0.3s ease-out;'
+    )
+    # Bot message - left aligned with card style
+    bot_bubble = Div(
+        Div(
+            Div(
+                Div("🤖", style='font-size: 20px;'),
+                Div("ShopSmart AI", style='font-weight: 700; color: #667eea;'),
+                style='display: flex; align-items: center; gap: 8px; margin-bottom: 8px; padding-bottom: 8px; border-bottom: 2px solid #f0f0f0;'
+            ),
+            Div(bot_msg, style='margin-bottom: 8px; line-height: 1.6; color: #2d3748; font-size: 15px;'),
+            Div(time_str, style='font-size: 10px; opacity: 0.5; text-align: left;'),
+            style='display: inline-block; padding: 18px 22px; background: linear-gradient(to bottom, #ffffff 0%, #f8f9ff 100%); color: #2d3748; border-radius: 24px 24px 24px 6px; max-width: 75%; word-wrap: break-word; box-shadow: 0 4px 12px rgba(0,0,0,0.08); border: 2px solid #f0f0f0;'
+        ),
+        style='text-align: left; margin-bottom: 20px; animation: slideIn 0.3s ease-out;'
+    )
+    return user_bubble, bot_bubble
+
+
+def streaming_reply(stream_url, target_id):
+    """Bot reply body filled in over Server-Sent Events
+
+    "token" events append text as it is generated, "final" replaces it with the
+    finished message (carrying any out-of-band cart updates) and "done" closes
+    the connection.
+    """
+    return Div(
+        Span(id=target_id, sse_swap='token', hx_swap='beforeend'),
+        Span(sse_swap='final', hx_target=f'#{target_id}', hx_swap='innerHTML'),
+        hx_ext='sse',
+        sse_connect=stream_url,
+        sse_close='done'
+    )
+
+
+def chat_history(messages):
+    """Full chat log, only rendered on page load"""
+    if not messages:
+        return [chat_empty_state()]
+    chat_display = []
+    for user_msg, bot_msg, time_str in messages:
+        chat_display.extend(chat_pair(user_msg, bot_msg, time_str))
+    return chat_display
+
+
+def cart_empty_state(visible=True):
+    """Placeholder shown while the cart has no items"""
+    return Div(
+        Div("🛍️", cls='empty-state-icon'),
+        Div("Your cart is empty - Add items to get started!", cls='empty-state-text'),
+        cls='empty-state',
+        id='cart-empty',
+        style=None if visible else 'display: none;'
+    )
+
+
+def cart_total_banner(total_price, visible=True):
+    """Cart total banner, hidden while the cart is empty"""
+    return Div(
+        Div(
+            Div("💰", style='font-size: 28px; margin-right: 12px;'),
+            Div(
+                Div("Cart Total", style='font-size: 13px; opacity: 0.9; text-transform: uppercase; letter-spacing: 1px;'),
+                Div(f"${total_price:.2f}", style='font-size: 28px; font-weight: 800; margin-top: 4px;'),
+                style='flex: 1;'
+            ),
+            style='display: flex; align-items: center; color: white;'
+        ),
+        id='cart-total',
+        style='background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); padding: 20px 24px; border-radius: 16px; margin-bottom: 20px; box-shadow: 0 6px 20px rgba(56, 239, 125, 0.4); animation: pulse 2s infinite;' + ('' if visible else ' display: none;')
+    )
+
+
+@lru_cache(maxsize=4096)
+def cart_item_id(product_name):
+    """Stable DOM id for a cart line, safe for any product name"""
+    return 'cart-item-' + hashlib.md5(product_name.encode()).hexdigest()[:12]
+
+
+@lru_cache(maxsize=4096)
+def _cart_item_html(product_name, quantity, price, bg_color, text_color_for):
+    """Rendered inner markup of one cart card, memoized on the values it shows"""
+    item_total = quantity * price
+    text_color = text_color_for(bg_color)
+    return to_xml(
+        Div(
+            Div(
+                Div("🏷️", style=f'font-size: 24px; margin-right: 12px; color: {text_color};'),
+                Div(
+                    Div(product_name, style=f'font-weight: 700; font-size: 18px; color: {text_color}; margin-bottom: 4px;'),
+                    Div(
+                        Div(
+                            Div("Qty", style=f'font-size: 11px; opacity: 0.8; text-transform: uppercase; color: {text_color};'),
+                            Div(str(quantity), style=f'font-size: 20px; font-weight: 700; color: {text_color};'),
+                        ),
+                        Div(
+                            Div("Price", style=f'font-size: 11px; opacity: 0.8; text-transform: uppercase; color: {text_color}; text-align: right;'),
+                            Div(f'${item_total:.2f}', style=f'font-size: 20px; font-weight: 700; color: {text_color};'),
+                        ),
+                        style='display: flex; justify-content: space-between; gap: 20px; margin-top: 8px;'
+                    ),
+                    style='flex: 1;'
+                ),
+                style='display: flex; align-items: center;'
+            ),
+            style=f'padding: 20px 24px; background: linear-gradient(135deg, {bg_color} 0%, {bg_color}dd 100%); border-radius: 16px;'
+        )
+    )
+
+
+def cart_item(product_name, quantity, price, bg_color, text_color_for, **kwargs):
+    """One cart card; extra kwargs (e.g. hx_swap_oob) go on the outer element"""
+    return Div(
+        NotStr(_cart_item_html(product_name, quantity, price, bg_color, text_color_for)),
+        id=cart_item_id(product_name),
+        style='margin-bottom: 16px;',
+        cls='cart-item',
+        **kwargs
+    )
+
+
+def cart_line(item):
+    """The values a cart card shows, compared to decide whether it needs re-rendering"""
+    return (item.quantity, item.price, item.color)
+
+
+def cart_snapshot(cart):
+    """What the cart panel shows for each line, kept to diff against later updates"""
+    return {product_name: cart_line(item) for product_name, item in cart.items()}
+
+
+def cart_contents(cart, text_color_for):
+    """Full cart panel: empty state, total banner and one card per line"""
+    rows = [
+        cart_item(product_name, item.quantity, item.price, item.color, text_color_for)
+        for product_name, item in cart.items()
+    ]
+    return [
+        cart_empty_state(visible=not cart),
+        cart_total_banner(cart.total_price, visible=bool(cart)),
+        Div(*rows, id='cart-items'),
+    ]
+
+
+def cart_updates(rendered, cart, changed_keys, text_color_for):
+    """Out-of-band swaps for only the cart lines that were added, changed or removed
+
+    rendered maps each key to the values the browser currently shows and is
+    updated in place, so the work is proportional to changed_keys, not cart size.
+    """
+    was_empty = not rendered
+    updates = []
+    new_keys = set()
+
+    for product_name in changed_keys:
+        previous = rendered.get(product_name)
+        item = cart.get(product_name)
+        if item is None:
+            if previous is not None:
+                del rendered[product_name]
+                updates.append(Div(id=cart_item_id(product_name), hx_swap_oob='delete'))
+            continue
+
+        current = cart_line(item)
+        if previous == current:
+            continue
+        rendered[product_name] = current
+        if previous is None:
+            new_keys.add(product_name)
+        else:
+            updates.append(cart_item(product_name, *current, text_color_for, hx_swap_oob='outerHTML'))
+
+    if new_keys:
+        # New lines go in cart order, as a full render shows them; only several at once need the walk
+        ordered = new_keys if len(new_keys) == 1 else [key for key in cart if key in new_keys]
+        added = [cart_item(key, *rendered[key], text_color_for) for key in ordered]
+        updates.append(Div(*added, hx_swap_oob='beforeend:#cart-items'))
+
+    # The empty state only changes when the cart empties or fills up; the banner is tiny
+    if was_empty != (not rendered):
+        updates.append(cart_empty_state(visible=not rendered)(hx_swap_oob='true'))
+    updates.append(cart_total_banner(cart.total_price, visible=bool(rendered))(hx_swap_oob='true'))
+    return updates
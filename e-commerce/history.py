@@ -0,0 +1,136 @@
+from dataclasses import replace
+import os
+import re
+
+# Marker the agent puts in front of the cart listing appended to each prompt
+CART_CONTEXT_HEADER = "\n\nCurrent cart contents:\n"
+SUMMARY_HEADER = "Summary of earlier conversation (oldest first):"
+
+SUMMARY_SNIPPET_CHARS = 120
+
+DEFAULT_MAX_TOKENS = int(os.getenv("SHOPSMART_HISTORY_TOKENS", "3000"))
+DEFAULT_KEEP_TURNS = int(os.getenv("SHOPSMART_HISTORY_TURNS", "6"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+def strip_cart_context(prompt: str) -> str:
+    """Drop the cart snapshot appended to a prompt; the next prompt carries a fresh one"""
+    index = prompt.find(CART_CONTEXT_HEADER)
+    return prompt if index == -1 else prompt[:index]
+
+
+def _snippet(text: str) -> str:
+    text = re.sub(r'\s+', ' ', text).strip()
+    if len(text) > SUMMARY_SNIPPET_CHARS:
+        text = text[:SUMMARY_SNIPPET_CHARS - 1] + '…'
+    return text
+
+
+def _text_of(message) -> str:
+    return ' '.join(part.content for part in message.parts if isinstance(getattr(part, 'content', None), str))
+
+
+class ConversationHistory:
+    """Agent message history held to a token budget
+
+    The last keep_turns turns are kept verbatim (minus their stale cart
+    listings); older turns are collapsed into one-line summaries carried in a
+    system prompt part, and the oldest summary lines are dropped once even
+    those exceed the budget.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_MAX_TOKENS, keep_turns: int = DEFAULT_KEEP_TURNS):
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.messages = []
+        self._summary_lines = []
+
+    def _split(self, messages):
+        """System prompt parts and the list of turns (each a list of messages)"""
+        # Imported here so loading the app doesn't pull in pydantic_ai before a model is used
+        from pydantic_ai.messages import ModelRequest, SystemPromptPart, UserPromptPart
+
+        system_parts = []
+        turns = []
+        for message in messages:
+            if isinstance(message, ModelRequest):
+                parts = []
+                for part in message.parts:
+                    if isinstance(part, SystemPromptPart):
+                        if not part.content.startswith(SUMMARY_HEADER) and not turns:
+                            system_parts.append(part)
+                        continue
+                    if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                        part = replace(part, content=strip_cart_context(part.content))
+                    parts.append(part)
+                message = replace(message, parts=parts)
+                if any(isinstance(part, UserPromptPart) for part in parts) or not turns:
+                    turns.append([])
+            turns[-1].append(message)
+        return system_parts, [turn for turn in turns if turn]
+
+    def _summarize(self, turn):
+        user_text = _text_of(turn[0])
+        reply_text = _text_of(turn[-1]) if len(turn) > 1 else ''
+        return f"- User: {_snippet(user_text)} → Assistant: {_snippet(reply_text)}"
+
+    def update(self, all_messages):
+        """Replace the history with a run's messages, compacted to the budget"""
+        from pydantic_ai.messages import SystemPromptPart
+
+        system_parts, turns = self._split(all_messages)
+
+        overflow = max(len(turns) - self.keep_turns, 0)
+        old_turns, turns = turns[:overflow], turns[overflow:]
+
+        def turn_tokens(turn):
+            return sum(estimate_tokens(_text_of(message)) for message in turn)
+
+        budget = self.max_tokens - sum(estimate_tokens(part.content) for part in system_parts)
+        kept_tokens = sum(turn_tokens(turn) for turn in turns)
+        # Even recent turns are summarized if they alone exceed the budget; the newest always stays
+        while len(turns) > 1 and kept_tokens > budget:
+            kept_tokens -= turn_tokens(turns[0])
+            old_turns.append(turns.pop(0))
+
+        self._summary_lines.extend(self._summarize(turn) for turn in old_turns)
+        summary_budget = budget - kept_tokens
+        while self._summary_lines and sum(estimate_tokens(line) for line in self._summary_lines) > summary_budget:
+            self._summary_lines.pop(0)
+
+        if not turns:
+            self.messages = []
+            return
+
+        leading_parts = list(system_parts)
+        if self._summary_lines:
+            leading_parts.append(SystemPromptPart(content='\n'.join([SUMMARY_HEADER, *self._summary_lines])))
+
+        first = turns[0][0]
+        messages = [replace(first, parts=leading_parts + list(first.parts))]
+        messages.extend(turns[0][1:])
+        for turn in turns[1:]:
+            messages.extend(turn)
+        self.messages = messages
+
+    def add_exchange(self, prompt: str, reply: str, system_prompt: str = ''):
+        """Add a turn answered without the model (from the reply cache), compacted like any other
+
+        system_prompt opens an empty history, as a model run would have.
+        """
+        from pydantic_ai.messages import ModelRequest, ModelResponse, SystemPromptPart, TextPart, UserPromptPart
+
+        parts = [UserPromptPart(content=prompt)]
+        if not self.messages and system_prompt:
+            parts.insert(0, SystemPromptPart(content=system_prompt))
+        self.update([*self.messages, ModelRequest(parts=parts), ModelResponse(parts=[TextPart(content=reply)])])
+
+    def token_estimate(self) -> int:
+        return sum(estimate_tokens(_text_of(message)) for message in self.messages)
+
+    def __len__(self):
+        return len(self.messages)
@@ -0,0 +1,266 @@
+import re
+
+from cart import Cart, normalize_name
+
+# Products the app can price before it has learned any: base name -> (display name, price, color)
+KNOWN_PRODUCTS = {
+    'apple': ('Apples', 3.99, '#DC143C'),
+    'banana': ('Bananas', 2.99, '#FFE135'),
+    'orange': ('Oranges', 4.49, '#FFA500'),
+    'grape': ('Grapes', 4.99, '#6F2DA8'),
+    'strawberry': ('Strawberries', 4.49, '#FC5A8D'),
+    'strawberrie': ('Strawberries', 4.49, '#FC5A8D'),
+    'lemon': ('Lemons', 2.49, '#FFF44F'),
+    'lime': ('Limes', 2.49, '#32CD32'),
+    'pear': ('Pears', 3.49, '#D1E231'),
+    'peach': ('Peaches', 3.99, '#FFDAB9'),
+    'peache': ('Peaches', 3.99, '#FFDAB9'),
+    'mango': ('Mangoes', 1.99, '#FFC324'),
+    'mangoe': ('Mangoes', 1.99, '#FFC324'),
+    'tomato': ('Tomatoes', 2.99, '#FF6347'),
+    'tomatoe': ('Tomatoes', 2.99, '#FF6347'),
+    'potato': ('Potatoes', 3.49, '#C4A484'),
+    'potatoe': ('Potatoes', 3.49, '#C4A484'),
+    'carrot': ('Carrots', 1.99, '#ED9121'),
+    'onion': ('Onions', 1.79, '#E5D1B8'),
+    'avocado': ('Avocados', 1.49, '#568203'),
+    'milk': ('Milk', 3.49, '#FDFFF5'),
+    'egg': ('Eggs', 4.29, '#F0EAD6'),
+    'bread': ('Bread', 2.99, '#DEB887'),
+    'butter': ('Butter', 4.99, '#FFDB58'),
+    'cheese': ('Cheese', 5.99, '#FFD700'),
+    'yogurt': ('Yogurt', 1.29, '#F5F5F5'),
+    'rice': ('Rice', 3.99, '#FAF9F6'),
+    'pasta': ('Pasta', 1.99, '#F3E5AB'),
+    'coffee': ('Coffee', 8.99, '#6F4E37'),
+    'tea': ('Tea', 4.49, '#D0F0C0'),
+    'water': ('Water', 0.99, '#ADD8E6'),
+    'juice': ('Juice', 3.99, '#FFA500'),
+    'orange juice': ('Orange Juice', 4.49, '#FFA500'),
+    'apple juice': ('Apple Juice', 3.99, '#F4C430'),
+    'chicken': ('Chicken', 7.99, '#F5DEB3'),
+}
+
+COLORS = {
+    'red': '#DC143C', 'green': '#228B22', 'blue': '#1E90FF', 'yellow': '#FFD700',
+    'orange': '#FFA500', 'purple': '#800080', 'pink': '#FFC0CB', 'black': '#000000',
+    'white': '#FFFFFF', 'gray': '#808080', 'grey': '#808080', 'brown': '#8B4513',
+    'navy': '#000080', 'beige': '#F5F5DC', 'gold': '#FFD700', 'silver': '#C0C0C0',
+}
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'a dozen': 12, 'dozen': 12, 'a couple of': 2, 'a couple': 2, 'some': 1,
+}
+
+_POLITE = re.compile(r"^(?:please |can you |could you |would you |i want to |i'd like to |i would like to |i want |i need |i'd like |let's |lets )+")
+_ADD_VERB = re.compile(r'^(?:add|put|buy|get|grab|include|throw in|also add|and)\b\s*')
+_REMOVE_VERB = re.compile(r'^(?:remove|delete|drop|take out|take away|get rid of|discard)\b\s*')
+_CART_SUFFIX = re.compile(r'\s+(?:to|into|in|from|out of|off)\s+(?:my |the )?(?:shopping )?(?:cart|basket|list)$')
+_TOTAL = re.compile(
+    r"^(?:what(?:'s| is) (?:my |the )?(?:cart )?total|(?:cart )?total|how much (?:is|does) (?:my |the )?(?:cart|total|it)(?: cost| come to)?"
+    r"|how much do i owe|how many items(?: are)?(?: in)?(?: my| the)?(?: cart)?|what(?:'s| is) in (?:my |the )?cart|show (?:me )?(?:my |the )?cart)$"
+)
+_QUANTITY = re.compile(r'^(\d+|' + '|'.join(sorted((re.escape(w) for w in NUMBER_WORDS), key=len, reverse=True)) + r')\b\s*')
+_PRICE = re.compile(r'\s*(?:for|at|@)\s*\$?\s*(\d+(?:\.\d{1,2})?)(?:\s*(?:dollars|each|bucks))?$|\s*\$(\d+(?:\.\d{1,2})?)(?:\s*each)?$')
+_SIZE = re.compile(r'\s*(?:,\s*)?(?:in )?size (\w+)$')
+_PRODUCT = re.compile(r"^[a-z][a-z' -]*$")
+_SPLIT = re.compile(r'\s*(?:,\s*(?:and\s+)?|\s+and\s+|\s*&\s*|\s+plus\s+)\s*')
+
+MAX_PRODUCT_WORDS = 4
+
+# Words that point at cart lines ("remove it", "the cheapest one") instead of naming a product
+_REFERENCE_WORDS = {
+    'it', 'them', 'that', 'this', 'those', 'these', 'one', 'ones', 'everything', 'anything',
+    'something', 'both', 'each', 'every', 'some', 'any', 'few', 'half', 'rest', 'other', 'others',
+    'item', 'items', 'thing', 'things', 'stuff', 'first', 'second', 'third', 'last', 'previous',
+    'most', 'least',
+}
+
+
+def _clean(text: str) -> str:
+    """Lowercase, collapse whitespace and drop polite filler and trailing punctuation"""
+    text = re.sub(r'\s+', ' ', text.strip().lower())
+    text = text.rstrip('.!')
+    text = _POLITE.sub('', text)
+    return text.replace('’', "'")
+
+
+def _parse_quantity(phrase: str):
+    """Leading quantity and the rest of the phrase; quantity is None if absent"""
+    match = _QUANTITY.match(phrase)
+    if not match:
+        return None, phrase
+    word = match.group(1)
+    quantity = int(word) if word.isdigit() else NUMBER_WORDS[word]
+    return quantity, phrase[match.end():]
+
+
+def default_lookup(name: str):
+    return KNOWN_PRODUCTS.get(normalize_name(name))
+
+
+def _split_attributes(rest: str, lookup):
+    """Pull a trailing "size m" and a leading colour adjective off a product phrase
+
+    Returns (product words, colour, size).
+    """
+    size = None
+    match = _SIZE.search(rest)
+    if match:
+        size = match.group(1)
+        rest = rest[:match.start()]
+
+    words = rest.split()
+    color = None
+    # Colour adjectives come before the product ("red apples"), unless the colour
+    # is part of a known product name ("orange juice")
+    if len(words) > 1 and words[0] in COLORS and lookup(' '.join(words)) is None:
+        color = words.pop(0)
+    return words, color, size
+
+
+def _format_attributes(color, size) -> str:
+    """Attributes as the cart shows them ("Red, Size M")"""
+    attributes = []
+    if color:
+        attributes.append(color.capitalize())
+    if size:
+        attributes.append(f"Size {size.upper() if len(size) <= 3 else size.capitalize()}")
+    return ', '.join(attributes)
+
+
+def _parse_add_item(phrase: str, lookup):
+    """One "3 red apples" / "purple top size m for $25" phrase as an add item, or None"""
+    quantity, rest = _parse_quantity(phrase)
+    if quantity is not None and quantity <= 0:
+        return None
+
+    price = None
+    match = _PRICE.search(rest)
+    if match:
+        price = float(match.group(1) or match.group(2))
+        rest = rest[:match.start()]
+
+    words, color, size = _split_attributes(rest, lookup)
+    if not words or len(words) > MAX_PRODUCT_WORDS:
+        return None
+
+    product = ' '.join(words)
+    if not _PRODUCT.match(product) or product in NUMBER_WORDS:
+        return None
+
+    known = lookup(product)
+    if known is not None and known[1] is None:
+        # Only a colour has been recorded for it so far
+        known = None
+    if known is None and price is None:
+        # Unknown product without a stated price: the model has to estimate it
+        return None
+
+    if known:
+        name, default_price, default_color = known
+    else:
+        name, default_price, default_color = product.title(), price, ''
+
+    return {
+        'name': name,
+        'quantity': quantity if quantity is not None else 1,
+        'color': COLORS[color] if color else default_color,
+        'attributes': _format_attributes(color, size),
+        'price': price if price is not None else default_price,
+    }
+
+
+def _parse_add(text: str, lookup):
+    phrases = [p for p in _SPLIT.split(text) if p]
+    if not phrases:
+        return None
+    items = []
+    for phrase in phrases:
+        phrase = _ADD_VERB.sub('', phrase)
+        item = _parse_add_item(phrase, lookup)
+        if item is None:
+            # One unclear item makes the whole request the model's job
+            return None
+        items.append(item)
+    return {'action': 'add', 'items': items}
+
+
+def _refers_to_cart_lines(words) -> bool:
+    """True for "it", "them all", "the cheapest item" and the like"""
+    # Superlatives ("cheapest", "newest"); the odd product caught by this just goes to the model
+    return any(word in _REFERENCE_WORDS or (len(word) > 5 and word.endswith('est')) for word in words)
+
+
+def _parse_remove(text: str, lookup, cart=None):
+    if _SPLIT.search(text) or _refers_to_cart_lines(text.split()):
+        # Only single, named products have a structured form
+        return None
+    quantity, rest = _parse_quantity(text)
+    if rest.startswith('all '):
+        quantity, rest = 0, rest[4:]
+    rest = re.sub(r'^(?:the|my|of the|of my) ', '', rest)
+
+    words, color, size = _split_attributes(rest, lookup)
+    if not words or len(words) > MAX_PRODUCT_WORDS:
+        return None
+    product = ' '.join(words)
+    if not _PRODUCT.match(product):
+        return None
+
+    known = lookup(product)
+    attributes = _format_attributes(color, size)
+    name = Cart.make_key(known[0] if known else product.title(), attributes)
+    if cart is None or cart.find(name) is None:
+        # Not in the cart: a known product can be reported missing locally, but an
+        # unknown name or a variant ("red apples" when only green ones are in) is the model's call
+        if known is None or attributes:
+            return None
+    return {'action': 'remove', 'name': name, 'quantity': quantity or 0}
+
+
+def looks_like_add(text: str) -> bool:
+    """Whether a prompt reads as a plain add request, even if only the model can price it"""
+    text = _CART_SUFFIX.sub('', _clean(text))
+    if not text or text.endswith('?') or _refers_to_cart_lines(text.split()):
+        return False
+    return bool(_ADD_VERB.match(text) or _QUANTITY.match(text))
+
+
+def parse_intent(text: str, lookup=default_lookup, cart=None):
+    """Parse simple cart commands locally.
+
+    lookup(name) returns (display name, price, color) for products whose
+    price is already known, such as ProductCatalog.lookup. Removals are only
+    handled here for products in `cart` (or known to lookup).
+
+    Returns the same {"action": ...} structure the model produces for add and
+    remove, {"action": "total"} for cart summary questions, or None when the
+    input isn't clearly one of those and should go to the model.
+    """
+    text = _clean(text)
+    if not text:
+        return None
+
+    if _TOTAL.match(text.rstrip('?').strip()):
+        return {'action': 'total'}
+    if text.endswith('?'):
+        return None
+
+    text = _CART_SUFFIX.sub('', text)
+
+    match = _REMOVE_VERB.match(text)
+    if match:
+        return _parse_remove(text[match.end():], lookup, cart)
+
+    match = _ADD_VERB.match(text)
+    if match:
+        return _parse_add(text[match.end():], lookup)
+
+    # Bare item lists like "2 bananas and 3 oranges" or "purple top size m for $25"
+    first_word = text.split(' ', 1)[0]
+    if _QUANTITY.match(text) or first_word in COLORS:
+        return _parse_add(text, lookup)
+    return None
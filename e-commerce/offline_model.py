@@ -0,0 +1,101 @@
+"""Offline stand-in for Gemini, for load tests and development without an API key.
+
+Replies are deterministic for a given prompt: add/remove requests get the same
+JSON actions the real model returns and anything else gets a short chat reply.
+Select it with SHOPSMART_MODEL_BACKEND=offline; SHOPSMART_OFFLINE_LATENCY sets
+the simulated time to first token in seconds.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+
+from pydantic_ai.messages import ModelResponse, TextPart, UserPromptPart
+from pydantic_ai.models.function import FunctionModel
+
+from history import strip_cart_context
+from intent_parser import NUMBER_WORDS
+
+DEFAULT_LATENCY = float(os.getenv("SHOPSMART_OFFLINE_LATENCY", "0.3"))
+
+_ADD = re.compile(r'\b(?:add|buy|get|put|grab|include)\b\s+(.*)', re.IGNORECASE)
+_REMOVE = re.compile(r'\b(?:remove|delete|drop|take out)\b\s+(.*)', re.IGNORECASE)
+_SPLIT = re.compile(r'\s*(?:,|\band\b|&)\s*', re.IGNORECASE)
+_FILLER = re.compile(r'\b(?:to|from|in|into)\s+(?:my |the )?cart\b|^(?:the|my|some)\s+|[.!?]+$', re.IGNORECASE)
+
+CHAT_REPLIES = [
+    "Great question! For a balanced basket, pair fresh produce with a few pantry staples like rice or pasta.",
+    "I'd suggest checking seasonal fruit first; it's usually cheaper and tastes better this time of year.",
+    "Your cart is shaping up nicely. If you're watching the budget, store-brand staples can save around 20%.",
+    "Happy to help! Tell me what you're cooking and I'll suggest ingredients to add.",
+]
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.md5(text.lower().encode()).hexdigest(), 16)
+
+
+def _price_for(name: str) -> float:
+    """Stable made-up price between $0.99 and $29.99"""
+    return round(0.99 + _digest(name) % 2900 / 100, 2)
+
+
+def _parse_item(phrase: str):
+    words = _FILLER.sub('', phrase.strip()).split()
+    quantity = 1
+    if words and (words[0].isdigit() or words[0].lower() in NUMBER_WORDS):
+        first = words.pop(0).lower()
+        quantity = int(first) if first.isdigit() else NUMBER_WORDS[first]
+    if not words:
+        return None
+    name = ' '.join(words).title()
+    return {'name': name, 'quantity': quantity, 'color': '', 'attributes': '', 'price': _price_for(name)}
+
+
+def scripted_reply(prompt: str) -> str:
+    """What the stand-in model answers to one prompt (cart listing already stripped)"""
+    # Merged bursts list one prompt per line
+    lines = [line[2:] for line in prompt.splitlines() if line.startswith('- ')] or [prompt]
+
+    items = []
+    for line in lines:
+        match = _ADD.search(line)
+        if match:
+            items.extend(item for item in map(_parse_item, _SPLIT.split(match.group(1))) if item)
+    if items:
+        return json.dumps({'action': 'add', 'items': items})
+
+    match = _REMOVE.search(lines[0])
+    if match:
+        item = _parse_item(match.group(1))
+        if item:
+            return json.dumps({'action': 'remove', 'name': item['name'], 'quantity': 0})
+
+    return CHAT_REPLIES[_digest(prompt) % len(CHAT_REPLIES)]
+
+
+def _last_prompt(messages) -> str:
+    for message in reversed(messages):
+        for part in reversed(message.parts):
+            if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                return strip_cart_context(part.content)
+    return ''
+
+
+def offline_model(latency: float = DEFAULT_LATENCY) -> FunctionModel:
+    """FunctionModel that answers with scripted_reply after `latency` seconds"""
+
+    async def respond(messages, info):
+        await asyncio.sleep(latency)
+        return ModelResponse(parts=[TextPart(scripted_reply(_last_prompt(messages)))])
+
+    async def stream(messages, info):
+        await asyncio.sleep(latency)
+        words = scripted_reply(_last_prompt(messages)).split(' ')
+        for i in range(0, len(words), 3):
+            yield ' '.join(words[i:i + 3]) + (' ' if i + 3 < len(words) else '')
+            # Later tokens arrive quickly, like a real stream
+            await asyncio.sleep(latency / 20)
+
+    return FunctionModel(respond, stream_function=stream, model_name='offline')
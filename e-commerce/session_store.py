@@ -0,0 +1,95 @@
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+
+from cart import Cart
+from history import ConversationHistory
+
+# A streamed turn is dropped if the browser doesn't open its /stream request within this many seconds
+PENDING_STREAM_TTL = 60
+# Turns held per session at most, oldest dropped first
+MAX_PENDING_STREAMS = 8
+
+
+class SessionState:
+    """Everything one shopper owns: cart, chat log and agent conversation history"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # Store messages as tuples (user_message, response, timestamp)
+        self.messages = []
+        # Store cart items with enhanced data
+        self.cart = Cart()
+        # Cart lines as last sent to the browser, diffed to build partial updates
+        self.rendered_cart = {}
+        self.favorites = set()
+        # Token-budgeted conversation history passed to the agent on every run
+        self.history = ConversationHistory()
+        # Prompts accepted by /submit whose reply is streamed by /stream/{turn_id}: turn id -> (prompt, created)
+        self.pending_streams = OrderedDict()
+        # (prompt, future) pairs that arrived while the session's previous prompts were running
+        self.batch = []
+        self.flushing = False
+        # Serializes requests from the same browser; other sessions never wait on it
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+    def add_pending_stream(self, prompt: str) -> str:
+        """Hold a prompt for its /stream request and return the turn id, dropping turns never opened"""
+        now = time.monotonic()
+        while self.pending_streams:
+            turn_id, (_, created) = next(iter(self.pending_streams.items()))
+            if now - created <= PENDING_STREAM_TTL and len(self.pending_streams) < MAX_PENDING_STREAMS:
+                break
+            del self.pending_streams[turn_id]
+        turn_id = secrets.token_urlsafe(8)
+        self.pending_streams[turn_id] = (prompt, now)
+        return turn_id
+
+    def take_pending_stream(self, turn_id: str):
+        """The prompt waiting for this turn's stream, or None if it's unknown or expired"""
+        entry = self.pending_streams.pop(turn_id, None)
+        if entry is None or time.monotonic() - entry[1] > PENDING_STREAM_TTL:
+            return None
+        return entry[0]
+
+
+class SessionStore:
+    """Session id -> SessionState, evicting the least recently used idle sessions"""
+
+    def __init__(self, max_sessions: int = 1000, idle_timeout: float = 6 * 60 * 60):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+
+    def get(self, session: dict) -> SessionState:
+        """Return the state for a cookie session, creating a new id if needed"""
+        session_id = session.get('sid')
+        state = self._sessions.get(session_id) if session_id else None
+
+        if state is None:
+            session_id = secrets.token_urlsafe(16)
+            session['sid'] = session_id
+            state = SessionState(session_id)
+            self._sessions[session_id] = state
+            self._evict()
+        else:
+            self._sessions.move_to_end(session_id)
+
+        state.last_seen = time.monotonic()
+        return state
+
+    def _evict(self):
+        """Drop expired sessions and cap the total number kept in memory"""
+        now = time.monotonic()
+        # Oldest first; never evict a session that is in the middle of a request
+        for session_id, state in list(self._sessions.items()):
+            expired = now - state.last_seen > self.idle_timeout
+            if not expired and len(self._sessions) <= self.max_sessions:
+                break
+            if not state.lock.locked():
+                del self._sessions[session_id]
+
+    def __len__(self):
+        return len(self._sessions)
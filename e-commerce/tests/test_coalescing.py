@@ -0,0 +1,70 @@
+"""A burst of chat submits is answered with one model call, sent the way the page sends it.
+
+Runs against the offline model with SHOPSMART_COALESCE=1. From the e-commerce folder:
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["SHOPSMART_MODEL_BACKEND"] = "offline"
+os.environ["SHOPSMART_OFFLINE_LATENCY"] = "0.2"
+os.environ["SHOPSMART_COALESCE"] = "1"
+os.environ["SHOPSMART_STREAMING"] = "0"
+os.environ["SHOPSMART_CATALOG_PATH"] = os.path.join(tempfile.mkdtemp(), "test_catalog.db")
+
+import app as shop  # noqa: E402
+from agent import MODEL_CALLS  # noqa: E402
+
+# Hyphenated names keep these off the local parser, so each one needs the model
+BURST = ["add a hand-woven basket", "add a cast-iron skillet", "add a hand-thrown vase"]
+
+
+def page_submit(client, prompt):
+    """POST /submit like the chat form's script: multipart FormData with the HX-Request header"""
+    return client.post("/submit", files={"prompt": (None, prompt)}, headers={"HX-Request": "true"})
+
+
+def test_chat_form_does_not_wait_for_the_previous_reply():
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=shop.app), base_url="http://test") as client:
+            return (await client.get("/")).text
+
+    page = asyncio.run(run())
+    assert "fetch('/submit'" in page
+    # htmx would queue the form's next request behind the one in flight
+    assert 'hx-post="/submit"' not in page
+
+
+def test_burst_is_merged_into_one_model_call():
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=shop.app), base_url="http://test") as client:
+            await client.get("/")
+            state = next(reversed(shop.sessions._sessions.values()))
+            first = asyncio.create_task(page_submit(client, BURST[0]))
+            # The rest arrive while the first prompt is with the model
+            await asyncio.sleep(0.05)
+            rest = await asyncio.gather(*(page_submit(client, prompt) for prompt in BURST[1:]))
+            return state, [await first, *rest]
+
+    calls = MODEL_CALLS.value(outcome="ok")
+    state, responses = asyncio.run(run())
+
+    assert all(response.status_code == 200 for response in responses)
+    # One call for the first prompt, one for the two that piled up behind it
+    assert MODEL_CALLS.value(outcome="ok") - calls == 2
+    assert shop.MERGED_NOTE in responses[1].text
+    assert "Added" in responses[2].text
+    assert len(state.cart) == 3
+
+
+def test_stated_price_only_applies_to_its_own_prompt():
+    prompts = ["add a hand-woven basket", "add a cast-iron skillet for $30"]
+    assert not shop.user_priced("Hand-Woven Basket", prompts)
+    assert shop.user_priced("Cast-Iron Skillet", prompts)
+
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+
+def read_queries(source: str) -> list:
+    """Queries from a file, one per line ("-" reads stdin); blank lines and # comments are skipped"""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+
+def completed_queries(output: str) -> set:
+    """Queries already answered in an earlier run's output, so a resumed batch skips them
+
+    Failed queries aren't counted and are tried again. A line torn by a crash is ignored.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done.add(record["query"])
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per finished query, flushed to disk straight away
+
+    The output file doubles as the checkpoint: whatever is in it survives an
+    interrupted batch and is skipped on the next run.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run_batch(queries: list, research, output: str, concurrency: int = 4, save=None, log=print) -> dict:
+    """Answer queries with at most `concurrency` in flight, each with its own empty history
+
+    research(query) -> (answer, tokens) runs one query; save(query, answer) -> path,
+    when given, stores each answer as a report. Results stream to the `output`
+    JSONL file as they finish (not in input order). Returns the throughput summary.
+    """
+    done = completed_queries(output)
+    pending = []
+    for query in queries:
+        # Duplicates in the input are only researched once
+        if query not in done:
+            pending.append(query)
+            done.add(query)
+    skipped = len(queries) - len(pending)
+    if skipped:
+        log(f"Skipping {skipped} of {len(queries)} queries already done or repeated, {len(pending)} to go")
+
+    work = asyncio.Queue()
+    for query in pending:
+        work.put_nowait(query)
+
+    writer = ResultWriter(output)
+    latencies = []
+    stats = {"ok": 0, "failed": 0, "tokens": 0}
+    start = time.perf_counter()
+
+    async def worker():
+        while True:
+            try:
+                query = work.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            began = time.perf_counter()
+            record = {"query": query, "started_at": time.time()}
+            try:
+                answer, tokens = await research(query)
+                record.update(status="ok", answer=answer, tokens=tokens)
+                if save is not None:
+                    record["saved_to"] = await save(query, answer)
+                stats["ok"] += 1
+                stats["tokens"] += tokens or 0
+            except Exception as e:
+                record.update(status="error", error=f"{type(e).__name__}: {str(e)[:300]}")
+                stats["failed"] += 1
+            record["seconds"] = round(time.perf_counter() - began, 3)
+            latencies.append(record["seconds"])
+            writer.write(record)
+            mark = "✓" if record["status"] == "ok" else "✗"
+            log(f"[{stats['ok'] + stats['failed']}/{len(pending)}] {mark} {query[:60]} ({record['seconds']:.1f}s)")
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(pending))))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    finished = stats["ok"] + stats["failed"]
+    return {
+        "queries": len(queries),
+        "skipped": skipped,
+        "ok": stats["ok"],
+        "failed": stats["failed"],
+        "elapsed_s": round(elapsed, 2),
+        "per_minute": round(finished / elapsed * 60, 1) if elapsed else 0.0,
+        "p50_s": round(percentile(latencies, 0.5), 2) if latencies else None,
+        "p95_s": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "tokens": stats["tokens"],
+    }
@@ -0,0 +1,32 @@
+"""Measure Research Pro's cold start: importing main, then loading the agent and tools.
+
+Each run is a fresh interpreter. Importing main should stay cheap, since the
+agent, pydantic_ai and the search tools load on first use (or during warm-up
+while the prompt waits). Pass --budget-ms to fail when the import regresses.
+Run from the research_agent folder:
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 250
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from common.startup import measure, print_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to take the median of")
+    parser.add_argument("--budget-ms", type=float, help="exit 1 if importing main takes longer than this")
+    args = parser.parse_args()
+
+    # Building the agent wants a key, though nothing is called
+    env = {"GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "startup-benchmark")}
+    result = measure(ROOT, "main", "main.get_agent()", runs=args.runs, env=env)
+    sys.exit(print_report(result, args.budget_ms))
+
+
+if __name__ == "__main__":
+    main()
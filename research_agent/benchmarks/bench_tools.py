@@ -0,0 +1,212 @@
+"""Benchmark the research tools and a full agent turn against a local search stand-in.
+
+A local HTTP server mimics the Wikipedia OpenSearch and extracts APIs and
+DuckDuckGo text results, with injectable latency, errors (HTTP 503) and timeouts, so tool
+latency can be measured reproducibly without the network. The agent turn uses
+a scripted model that calls both search tools and then answers. Run from the
+research_agent folder:
+    python benchmarks/bench_tools.py --latency-ms 80 --error-rate 0.05 --timeout-rate 0.02
+Set RESEARCH_PASSAGE_TOKENS=0 to compare against titles and descriptions only.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = [
+    "python programming", "climate change", "telephone inventor", "quantum computing",
+    "roman empire", "photosynthesis", "machine learning", "mount everest",
+]
+FILLER = ("early", "period", "region", "research", "century", "developed", "system", "known",
+          "public", "modern", "later", "first", "major", "general", "process", "work")
+
+
+def article_text(title, paragraphs=40):
+    """A long, reproducible stand-in article; a few paragraphs mention the title's words"""
+    rng = random.Random(title)
+    words = title.lower().split()
+    sections = []
+    for i in range(paragraphs):
+        sentence = [rng.choice(FILLER) for _ in range(90)]
+        if i % 9 == 0:
+            sentence[::15] = [rng.choice(words) for _ in sentence[::15]]
+        if i % 10 == 0:
+            sections.append(f"== Section {i // 10 + 1} ==")
+        sections.append(" ".join(sentence).capitalize() + ".")
+    return "\n\n".join(sections)
+
+
+class SearchStandIn(BaseHTTPRequestHandler):
+    """Serves /w/api.php (OpenSearch and extracts) and /ddg (DDGS-style JSON results)"""
+    latency = 0.05
+    error_rate = 0.0
+    timeout_rate = 0.0
+    stall = 5.0  # How long a "timed out" request hangs, longer than the client timeout
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        roll = random.random()
+        if roll < self.timeout_rate:
+            # The client has given up by now; close without answering
+            time.sleep(self.stall)
+            return
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if self.timeout_rate <= roll < self.timeout_rate + self.error_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if url.path == "/w/api.php" and params.get("action") == ["query"]:
+            title = params.get("titles", [""])[0]
+            body = {"query": {"pages": {"1": {"title": title, "extract": article_text(title)}}}}
+        elif url.path == "/w/api.php":
+            query = params.get("search", [""])[0]
+            titles = [f"{query.title()} {suffix}".strip() for suffix in ("", "(overview)", "history")]
+            body = [query, titles,
+                    [f"Article about {title}." for title in titles],
+                    [f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}" for title in titles]]
+        elif url.path == "/ddg":
+            query = params.get("q", [""])[0]
+            body = [{"title": f"{query.title()} - result {i}", "href": f"https://example.com/{i}",
+                     "body": f"Snippet {i} about {query}."} for i in range(1, 4)]
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(args):
+    SearchStandIn.latency = args.latency_ms / 1000
+    SearchStandIn.error_rate = args.error_rate
+    SearchStandIn.timeout_rate = args.timeout_rate
+    SearchStandIn.stall = args.timeout + 1
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SearchStandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def summarize(name, samples, failures, chars=None):
+    ordered = sorted(samples)
+
+    def pct(fraction):
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000
+
+    print(f"{name:<14} | {len(samples):>5} | {pct(0.5):>7.1f} | {pct(0.95):>7.1f} | {pct(0.99):>7.1f} | "
+          f"{ordered[-1] * 1000:>7.1f} | {failures:>6} | {chars if chars is not None else '-':>9}")
+
+
+async def bench_tool(name, tool, calls, concurrency):
+    """Latencies of `calls` tool invocations, `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+    failures = 0
+    sizes = []
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            result = await tool(None, QUERIES[i % len(QUERIES)])
+            samples.append(time.perf_counter() - start)
+            sizes.append(len(result))
+            # Successful results start with the source's banner
+            if not result.startswith(("📚", "🦆")):
+                failures += 1
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    summarize(name, samples, failures, sum(sizes) // len(sizes))
+
+
+async def bench_agent(agent, turns, concurrency):
+    """End-to-end time of agent turns that call both search tools"""
+    from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+    from pydantic_ai.models.function import FunctionModel
+
+    def scripted(messages, info):
+        if not any(isinstance(part, ToolReturnPart) for message in messages for part in message.parts):
+            query = messages[-1].parts[-1].content
+            return ModelResponse(parts=[ToolCallPart("web_search", {"query": query}),
+                                        ToolCallPart("duck_search", {"query": query})])
+        return ModelResponse(parts=[TextPart("Here is a summary of what the sources say.")])
+
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await agent.run(QUERIES[i % len(QUERIES)])
+            samples.append(time.perf_counter() - start)
+
+    with agent.override(model=FunctionModel(scripted)):
+        await asyncio.gather(*(one(i) for i in range(turns)))
+    summarize("agent turn", samples, 0)
+
+
+async def run(args):
+    from tools import web_search, duck_search, close_tools, search_cache
+    import main
+
+    print(f"{'':<14} | {'calls':>5} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'max ms':>7} | {'failed':>6} | {'avg chars':>9}")
+    print("-" * 82)
+    await bench_tool("web_search", web_search, args.calls, args.concurrency)
+    await bench_tool("duck_search", duck_search, args.calls, args.concurrency)
+    await bench_agent(main.get_agent(), args.turns, args.concurrency)
+    if args.cache:
+        print(f"\nsearch cache: {search_cache.stats()}")
+    await close_tools()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100, help="calls per tool")
+    parser.add_argument("--turns", type=int, default=20, help="agent turns")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50, help="mean stand-in response time")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of requests that hang past the timeout")
+    parser.add_argument("--timeout", type=float, default=2.0, help="client timeout in seconds")
+    parser.add_argument("--cache", action="store_true", help="enable the search result cache (off to measure the network path)")
+    args = parser.parse_args()
+
+    server = start_server(args)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    # The tools read these at import
+    os.environ["WIKIPEDIA_API_URL"] = f"{base}/w/api.php"
+    os.environ["DDG_API_URL"] = f"{base}/ddg"
+    os.environ["RESEARCH_SEARCH_TIMEOUT"] = str(args.timeout)
+    os.environ["RESEARCH_SEARCH_CACHE"] = "1" if args.cache else "0"
+    # A throwaway cache file, so runs never reuse each other's results
+    os.environ["RESEARCH_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "search_cache.db")
+    # The agent's model is replaced by the scripted one, but building it still wants a key
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
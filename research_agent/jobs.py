@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+
+class Job:
+    """One submitted query and what became of it"""
+
+    def __init__(self, number: int, query: str):
+        self.number = number
+        self.query = query
+        self.state = "queued"  # queued → running → done | failed | cancelled
+        self.task = None
+        self.result = None
+        self.error = None
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self._unshown = []
+
+    @property
+    def ended(self) -> bool:
+        return self.state in ("done", "failed", "cancelled")
+
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - (self.started or self.submitted)
+
+
+class JobQueue:
+    """Runs queries as background tasks, at most max_running at a time, showing output in submission order
+
+    run(query, emit) does the work and returns its result; everything it passes
+    to emit() is written straight through while its job is the oldest one still
+    on screen, and held back until then otherwise. on_finish(job) is called in
+    submission order once a job's output has been shown.
+    """
+
+    def __init__(self, run, write, on_finish=None, max_running: int = 3):
+        self.run = run
+        self.write = write
+        self.on_finish = on_finish
+        self._slots = asyncio.Semaphore(max_running)
+        self._jobs = []  # Jobs whose output hasn't been fully shown, oldest first
+        self._count = 0
+
+    def submit(self, query: str) -> Job:
+        self._count += 1
+        job = Job(self._count, query)
+        self._jobs.append(job)
+        job.task = asyncio.ensure_future(self._run(job))
+        # A done callback (rather than try/finally) also sees jobs cancelled before they ever ran
+        job.task.add_done_callback(lambda task: self._settle(job))
+        return job
+
+    async def _run(self, job: Job):
+        try:
+            async with self._slots:
+                job.state = "running"
+                job.started = time.perf_counter()
+                job.result = await self.run(job.query, lambda text: self._emit(job, text))
+                job.state = "done"
+        except Exception as e:
+            job.state = "failed"
+            job.error = e
+
+    def _settle(self, job: Job):
+        if not job.ended:
+            job.state = "cancelled"
+        job.finished = time.perf_counter()
+        self._advance()
+
+    def _emit(self, job: Job, text: str):
+        if self._jobs and self._jobs[0] is job:
+            self.write(text)
+        else:
+            job._unshown.append(text)
+
+    def _advance(self):
+        """Show finished jobs at the front of the line, then whatever the new front job has buffered"""
+        while self._jobs:
+            head = self._jobs[0]
+            if head._unshown:
+                self.write("".join(head._unshown))
+                head._unshown.clear()
+            if not head.ended:
+                return
+            self._jobs.pop(0)
+            if self.on_finish is not None:
+                self.on_finish(head)
+
+    def is_front(self, job: Job) -> bool:
+        return bool(self._jobs) and self._jobs[0] is job
+
+    def pending(self) -> list:
+        """Jobs not yet shown in full, oldest first"""
+        return list(self._jobs)
+
+    def cancel(self, number: int = None) -> list:
+        """Cancel job `number`, or every unfinished job; returns the jobs cancelled"""
+        cancelled = []
+        for job in self._jobs:
+            if job.ended or (number is not None and job.number != number):
+                continue
+            job.task.cancel()
+            cancelled.append(job)
+        return cancelled
+
+    async def wait(self):
+        """Until every submitted job has finished and been shown"""
+        tasks = [job.task for job in self._jobs]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
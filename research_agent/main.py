@@ -1,11 +1,20 @@
-from pydantic_ai import Agent
+import argparse
 import asyncio
 # import logfire  # Commented out - run without Logfire
 from dotenv import load_dotenv
+import os
 import time
-from tools import web_search, get_date_time, duck_search, save_research
+from contextlib import contextmanager
+from batch import read_queries, run_batch
+from jobs import JobQueue
 from colorama import init, Fore, Back, Style
 import sys
+import threading
+
+# Shared helpers live in common/ at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import REGISTRY
+from common.resilience import ResilientCaller, RetryPolicy, classify_error
 
 # Initialize colorama for Windows color support
 init(autoreset=True)
@@ -19,6 +28,8 @@ load_dotenv(override=True)
 
 # Use Gemini 2.0 Flash
 model = "gemini-2.0-flash"
+# Used when Gemini 2.0 Flash keeps failing or its circuit is open; empty disables fallback
+fallback_model = os.getenv("RESEARCH_FALLBACK_MODEL", "gemini-2.0-flash-lite")
 
 def print_banner():
     """Print a colorful banner"""
@@ -37,40 +48,59 @@ def print_capabilities():
     print(f"{Fore.GREEN}  🦆 DuckDuckGo Search{Fore.CYAN} - General web search")
     print(f"{Fore.GREEN}  📅 Date & Time{Fore.CYAN} - Get current date/time")
     print(f"{Fore.GREEN}  💾 Save Research{Fore.CYAN} - Export findings to files")
+    print(f"{Fore.GREEN}  📂 Saved Research Search{Fore.CYAN} - Find earlier reports on disk")
     print(f"{Fore.MAGENTA}╚═══════════════════════════════╝{Style.RESET_ALL}\n")
 
+STATUS_STYLES = {
+    "info": (Fore.CYAN, "ℹ"),
+    "success": (Fore.GREEN, "✓"),
+    "error": (Fore.RED, "✗"),
+    "thinking": (Fore.YELLOW, "🤔"),
+}
+
+
+def format_status(message, status="info"):
+    """A colored status line (without the newline)"""
+    color, icon = STATUS_STYLES[status]
+    return f"{color}{icon} {message}{Style.RESET_ALL}"
+
 def print_status(message, status="info"):
     """Print colored status messages"""
-    if status == "info":
-        print(f"{Fore.CYAN}ℹ {message}{Style.RESET_ALL}")
-    elif status == "success":
-        print(f"{Fore.GREEN}✓ {message}{Style.RESET_ALL}")
-    elif status == "error":
-        print(f"{Fore.RED}✗ {message}{Style.RESET_ALL}")
-    elif status == "thinking":
-        print(f"{Fore.YELLOW}🤔 {message}{Style.RESET_ALL}")
+    print(format_status(message, status))
 
 def print_separator():
     """Print a separator line"""
     print(f"{Fore.BLUE}{'─' * 70}{Style.RESET_ALL}")
 
-# Create the research agent with enhanced tools
-agent = Agent(
-    model,
-    system_prompt="""You are Research Pro, an expert AI research assistant specializing in comprehensive information gathering and analysis.
+def print_saved_reports(limit=10):
+    """List the most recently saved reports from the manifest"""
+    from tools import get_report_writer
+    reports = get_report_writer().list_reports(limit)
+    if not reports:
+        print_status("No saved research yet.", "info")
+        return
+    print(f"\n{Fore.MAGENTA}╔═══ Saved Research (newest first) ═══╗{Style.RESET_ALL}")
+    for report in reports:
+        saved = time.strftime('%b %d, %Y %I:%M %p', time.localtime(report["saved_at"]))
+        print(f"{Fore.GREEN}  📁 {report['topic']}{Fore.CYAN} - {saved}, {report['chars']:,} chars ({report['file']})")
+    print(f"{Fore.MAGENTA}╚══════════════════════════════════════╝{Style.RESET_ALL}")
+
+SYSTEM_PROMPT = """You are Research Pro, an expert AI research assistant specializing in comprehensive information gathering and analysis.
     
     Your enhanced capabilities:
     - 🔍 Multi-source web search (Wikipedia, DuckDuckGo)
     - 📅 Real-time date and time information
     - 💾 Save research findings to organized files
+    - 📂 Search research saved in earlier sessions
     - 📊 Data synthesis and analysis
     
     Research workflow:
-    1. Use web_search and duck_search to gather comprehensive information
-    2. Cross-reference multiple sources for accuracy
-    3. Synthesize findings into clear, well-organized summaries
-    4. Offer to save important research using save_research tool
-    5. Cite sources and provide URLs when available
+    1. Check search_saved_research first; if a saved report covers the topic, answer from it and cite the file
+    2. Otherwise use web_search and duck_search to gather comprehensive information
+    3. Cross-reference multiple sources for accuracy
+    4. Synthesize findings into clear, well-organized summaries
+    5. Offer to save important research using save_research tool
+    6. Cite sources and provide URLs when available
     
     Example interactions:
     - "Research Python programming" → Search multiple sources, synthesize info
@@ -78,11 +108,347 @@ agent = Agent(
     - "Research climate change and save it" → Comprehensive research + file save
     
     Be thorough, accurate, and always cite your sources. Format responses with clear sections and bullet points when appropriate.
-    """,
-    tools=[web_search, duck_search, get_date_time, save_research]
+    """
+
+# The research agent; pydantic_ai, the model client and the search tools are the slow part of
+# startup, so they're loaded on first use (or by warm-up while the prompt waits) - see get_agent
+_agent = None
+_agent_lock = threading.Lock()
+agent_load_seconds = None
+agent_load_error = None
+
+
+def get_agent():
+    """The research agent with its tools, built once; safe to call from any thread"""
+    global _agent, agent_load_seconds, agent_load_error
+    with _agent_lock:
+        if _agent is None:
+            started = time.perf_counter()
+            try:
+                from pydantic_ai import Agent
+                from tools import web_search, get_date_time, duck_search, save_research, search_saved_research
+
+                # Create the research agent with enhanced tools
+                _agent = Agent(
+                    model,
+                    system_prompt=SYSTEM_PROMPT,
+                    tools=[search_saved_research, web_search, duck_search, get_date_time, save_research]
+                )
+            except Exception as e:
+                agent_load_error = e
+                raise
+            agent_load_seconds = time.perf_counter() - started
+            agent_load_error = None
+    return _agent
+
+
+async def load_agent():
+    """get_agent() without blocking the event loop while it loads"""
+    if _agent is not None:
+        return _agent
+    return await asyncio.to_thread(get_agent)
+
+
+async def close_loaded_tools():
+    """Release the tools' pools and pending saves, if the tools were ever loaded"""
+    tools = sys.modules.get("tools")
+    if tools is not None:
+        await tools.close_tools()
+
+# Live progress lines shown while the agent runs a tool
+TOOL_LABELS = {
+    "web_search": "📚 Searching Wikipedia",
+    "duck_search": "🦆 Searching DuckDuckGo",
+    "get_date_time": "📅 Checking the date and time",
+    "save_research": "💾 Saving research file",
+    "search_saved_research": "📂 Searching saved research",
+}
+
+
+def format_tool_call(tool_name, args):
+    """A progress line for a tool call the agent just made"""
+    label = TOOL_LABELS.get(tool_name, f"🔧 Running {tool_name}")
+    detail = args.get("query") or args.get("filename") or ""
+    suffix = f' "{detail}"' if detail else ""
+    return f"{Fore.YELLOW}  {label}{suffix}...{Style.RESET_ALL}"
+
+
+def write_stdout(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+# Longest a single model request may take; a query can make several, with tool calls in between
+MODEL_REQUEST_TIMEOUT = float(os.getenv("RESEARCH_MODEL_TIMEOUT", "60"))
+
+# Shown by the 'metrics' command and at the end of a batch
+QUERY_SECONDS = REGISTRY.histogram("research_query_seconds", "Time to answer one query, retries included")
+QUERIES = REGISTRY.counter("research_queries_total", "Queries by outcome", ("outcome",))
+MODEL_TURN_SECONDS = REGISTRY.histogram("research_model_turn_seconds", "Time per model request, until its response is streamed")
+TOOL_SECONDS = REGISTRY.histogram("research_tool_seconds", "Time per tool call", ("tool",))
+MODEL_RETRIES = REGISTRY.counter("research_model_retries_total", "Model call retries by error kind", ("kind",))
+TOKENS = REGISTRY.counter("research_tokens_total", "Model tokens used", ("direction",))
+
+caller = ResilientCaller(
+    model,
+    fallback_model,
+    policy=RetryPolicy(max_attempts=int(os.getenv("RESEARCH_MAX_ATTEMPTS", "4")), deadline=60.0),
+    on_retry=lambda kind: MODEL_RETRIES.inc(kind=kind.value),
 )
 
-time.sleep(1)
+
+@contextmanager
+def track_query():
+    """Time one query, retries included, and count how it ended"""
+    outcome = "cancelled"
+    start = time.perf_counter()
+    try:
+        yield
+        outcome = "ok"
+    except Exception:
+        outcome = "failed"
+        raise
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - start)
+        QUERIES.inc(outcome=outcome)
+
+
+def record_usage(result):
+    usage = result.usage()
+    TOKENS.inc(usage.input_tokens or 0, direction="input")
+    TOKENS.inc(usage.output_tokens or 0, direction="output")
+
+
+async def run_query(user_input, message_history, model_name=None, progress=None, out=write_stdout):
+    """Run one query, streaming the answer and tool progress through out() (the terminal by default)
+
+    Returns the run result and a dict of timings in seconds: time to first
+    token ("first_token", None if no text was produced) and total time.
+    progress["started"] is set once text is shown or a tool runs.
+    """
+    from pydantic_ai import Agent
+    from pydantic_ai.messages import (
+        FunctionToolCallEvent,
+        FunctionToolResultEvent,
+        PartDeltaEvent,
+        PartStartEvent,
+        TextPart,
+        TextPartDelta,
+    )
+
+    start = time.perf_counter()
+    agent = await load_agent()
+    first_token = None
+    progress = progress if progress is not None else {}
+    progress["started"] = False
+    run_model = None if model_name in (None, model) else model_name
+    tool_started = {}  # tool_call_id -> (tool name, start time)
+
+    def write_text(text):
+        nonlocal first_token
+        if not text:
+            return
+        progress["started"] = True
+        if first_token is None:
+            first_token = time.perf_counter() - start
+            out(f"\n{Fore.MAGENTA}╔═══ Research Pro Response ═══╗{Style.RESET_ALL}\n")
+        out(f"{Fore.WHITE}{text}{Style.RESET_ALL}")
+
+    async def stream_model_request(node, ctx):
+        # Stream text parts as the model generates them
+        async with node.stream(ctx) as request_stream:
+            async for event in request_stream:
+                if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                    write_text(event.part.content)
+                elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                    write_text(event.delta.content_delta)
+
+    async with agent.iter(user_input, message_history=message_history, model=run_model) as run:
+        async for node in run:
+            if Agent.is_model_request_node(node):
+                # The timeout covers this model request only, not the tools the run goes on to call
+                with MODEL_TURN_SECONDS.time():
+                    await asyncio.wait_for(stream_model_request(node, run.ctx), timeout=MODEL_REQUEST_TIMEOUT)
+            elif Agent.is_call_tools_node(node):
+                # Report each tool call as it starts and finishes
+                async with node.stream(run.ctx) as tool_stream:
+                    async for event in tool_stream:
+                        if isinstance(event, FunctionToolCallEvent):
+                            progress["started"] = True
+                            tool_started[event.part.tool_call_id] = (event.part.tool_name, time.perf_counter())
+                            out(format_tool_call(event.part.tool_name, event.part.args_as_dict()) + "\n")
+                        elif isinstance(event, FunctionToolResultEvent):
+                            if event.tool_call_id in tool_started:
+                                tool_name, tool_start = tool_started.pop(event.tool_call_id)
+                                TOOL_SECONDS.observe(time.perf_counter() - tool_start, tool=tool_name)
+                            label = TOOL_LABELS.get(event.result.tool_name, event.result.tool_name)
+                            out(f"{Fore.GREEN}  ✓ {label} done{Style.RESET_ALL}\n")
+
+    if first_token is not None:
+        out(f"\n{Fore.MAGENTA}╚═══════════════════════════════╝{Style.RESET_ALL}\n\n")
+
+    record_usage(run.result)
+    return run.result, {"first_token": first_token, "total": time.perf_counter() - start}
+
+
+async def run_query_with_retries(user_input, message_history, out=write_stdout):
+    """run_query with backoff, circuit breaking and fallback
+
+    Only retried while nothing has been shown and no tool has run, so an answer
+    is never printed twice and research is never saved twice.
+    """
+    deadline = caller.new_deadline()
+    attempt = 0
+    with track_query():
+        while True:
+            model_name = caller.choose_model(attempt)
+            progress = {}
+            try:
+                result = await run_query(user_input, message_history, model_name, progress, out)
+            except Exception as e:
+                caller.record_failure(model_name, e)
+                delay = None if progress.get("started") else caller.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                out(format_status(f"{model_name} failed ({classify_error(e).value}), retrying in {delay:.1f}s... "
+                                  f"(Attempt {attempt + 1}/{caller.policy.max_attempts})", "info") + "\n")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            caller.record_success(model_name)
+            return result
+
+
+async def research_quietly(query):
+    """Answer one query without terminal output, with a fresh history; returns (answer, total tokens)"""
+    # Same retries as the interactive CLI: none once a tool has run, so a report is never saved twice
+    result, _ = await run_query_with_retries(query, [], out=lambda text: None)
+    return result.output, result.usage().total_tokens
+
+
+async def save_answer(query, answer):
+    """Store a batch answer as a research report; returns its path"""
+    from tools import write_report
+    return write_report(query[:80], answer)
+
+
+async def batch_main(args):
+    """Non-interactive mode: research every query in args.batch and write results to args.output"""
+    queries = read_queries(args.batch)
+    print_status(f"Batch of {len(queries)} queries, {args.concurrency} at a time → {args.output}", "info")
+    try:
+        summary = await run_batch(
+            queries,
+            research_quietly,
+            args.output,
+            concurrency=args.concurrency,
+            save=save_answer if args.save else None,
+            log=lambda message: print_status(message, "info"),
+        )
+    finally:
+        await close_loaded_tools()
+
+    print_separator()
+    print_status(f"Batch done: {summary['ok']} answered, {summary['failed']} failed, "
+                 f"{summary['skipped']} skipped in {summary['elapsed_s']:.1f}s "
+                 f"({summary['per_minute']} queries/min)", "success" if not summary["failed"] else "error")
+    if summary["p50_s"] is not None:
+        print_status(f"Per query: p50 {summary['p50_s']:.1f}s, p95 {summary['p95_s']:.1f}s; "
+                     f"{summary['tokens']:,} tokens", "info")
+    if summary["failed"]:
+        print_status("Rerun the same command to retry the failed queries.", "info")
+    print_metrics()
+    return summary
+
+
+# Queries researched at the same time in the interactive CLI; later ones wait their turn
+MAX_RUNNING_QUERIES = int(os.getenv("RESEARCH_MAX_RUNNING", "3"))
+
+
+def start_input_reader(loop, lines, wanted):
+    """Read input on a daemon thread so queries keep running while the prompt waits
+
+    One line is read each time `wanted` is set and put on the `lines` queue;
+    None is put there at end of input.
+    """
+    prompt = f"\n{Fore.GREEN}You{Fore.WHITE} → {Style.RESET_ALL}"
+    interactive = sys.stdin.isatty()
+    unread = b""
+
+    def read_piped():
+        # Straight from the file descriptor: a daemon thread left blocked inside
+        # sys.stdin's buffer would abort interpreter shutdown
+        nonlocal unread
+        write_stdout(prompt)
+        while b"\n" not in unread:
+            chunk = os.read(sys.stdin.fileno(), 4096)
+            if not chunk:
+                break
+            unread += chunk
+        if not unread:
+            return None
+        line, _, unread = unread.partition(b"\n")
+        return line.decode("utf-8", errors="replace").rstrip("\r")
+
+    def read():
+        while True:
+            wanted.wait()
+            wanted.clear()
+            try:
+                # Prompt with color
+                line = input(prompt) if interactive else read_piped()
+            except EOFError:
+                line = None
+            loop.call_soon_threadsafe(lines.put_nowait, line)
+            if line is None:
+                return
+
+    threading.Thread(target=read, name="input", daemon=True).start()
+
+def print_readiness():
+    """Whether the agent is loaded yet (the prompt itself is up from the start)"""
+    if _agent is not None:
+        print_status(f"Agent ready (loaded in {agent_load_seconds:.2f}s).", "success")
+    elif agent_load_error is not None:
+        print_status(f"Agent failed to load: {agent_load_error}", "error")
+    else:
+        print_status("Agent still loading; queries will start as soon as it's ready.", "thinking")
+
+def format_seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def print_metrics():
+    """Query, model turn and tool timings plus token usage recorded in this process"""
+    rows = REGISTRY.summary()
+    if not rows:
+        print_status("No metrics yet; ask a question first.", "info")
+        return
+    print(f"\n{Fore.MAGENTA}╔═══ Metrics ═══╗{Style.RESET_ALL}")
+    for row in rows:
+        labels = ", ".join(f"{name}={value}" for name, value in row["labels"].items())
+        name = f"{row['name']}{{{labels}}}" if labels else row["name"]
+        if "count" in row:
+            print(f"{Fore.GREEN}  {name}{Fore.CYAN} - {row['count']} × mean {format_seconds(row['mean'])}, "
+                  f"p50 {format_seconds(row['p50'])}, p95 {format_seconds(row['p95'])}")
+        else:
+            print(f"{Fore.GREEN}  {name}{Fore.CYAN} - {row['value']:,}")
+    print(f"{Fore.MAGENTA}╚═══════════════╝{Style.RESET_ALL}\n")
+
+
+def print_jobs(jobs):
+    """List queries that are still running or waiting to be shown"""
+    if not jobs:
+        print_status("No queries in progress.", "info")
+        return
+    for job in jobs:
+        print_status(f"#{job.number} {job.state} ({job.elapsed():.1f}s): {job.query[:60]}", "info")
+
+def print_goodbye():
+    print(f"\n{Fore.CYAN}╔══════════════════════════════════════════╗")
+    print(f"{Fore.CYAN}║  {Fore.YELLOW}👋 Thank you for using Research Pro!  {Fore.CYAN}║")
+    print(f"{Fore.CYAN}║  {Fore.GREEN}Happy researching and learning!       {Fore.CYAN}║")
+    print(f"{Fore.CYAN}╚══════════════════════════════════════════╝{Style.RESET_ALL}\n")
 
 
 async def main():
@@ -93,63 +459,139 @@ async def main():
     print_capabilities()
     print_status("Research Pro is ready to assist you!", "success")
     print(f"\n{Fore.YELLOW}Type 'exit', 'quit', or 'bye' to end the session.{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}Type 'saved' to list saved research, 'metrics' for timings and token usage.{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}Ask follow-ups while an answer is running; 'status' lists queries, 'cancel N' stops one.{Style.RESET_ALL}")
     print(f"{Fore.YELLOW}Press Ctrl+C for emergency exit.{Style.RESET_ALL}\n")
     print_separator()
-    
-    conversation_count = 0
 
-    while True:
-        try:
-            # Prompt with color
-            user_input = input(f"\n{Fore.GREEN}You{Fore.WHITE} → {Style.RESET_ALL}")
+    async def research(query, emit):
+        # Starts from the conversation so far, including answers that finished while this query waited
+        return await run_query_with_retries(query, list(message_history), out=emit)
+
+    def finished(job):
+        """Wrap up a query once its answer has been shown; called in the order queries were asked"""
+        nonlocal message_history
+        if job.state == "done":
+            response, timings = job.result
+            # Only this run's messages: other queries may have finished since it started
+            message_history = message_history + response.new_messages()
+
+            first_token = timings["first_token"]
+            first_token_text = f"first token {first_token:.2f}s, " if first_token is not None else ""
+            print_status(f"Query #{job.number} complete! ({first_token_text}total {timings['total']:.2f}s)", "success")
+            from tools import search_cache
+            cache = search_cache.stats()
+            lookups = cache["hits"] + cache["stale_hits"] + cache["misses"]
+            if lookups:
+                print_status(f"Search cache: {cache['hits'] + cache['stale_hits']}/{lookups} hits "
+                             f"({cache['hit_rate']:.0%}, {cache['stale_hits']} stale)", "info")
+        elif job.state == "failed":
+            print_status(f"Query #{job.number} error: {str(job.error)}", "error")
+            # logfire.error(f"Error in main loop: {str(e)}")  # Commented out
+        else:
+            print_status(f"Query #{job.number} cancelled.", "info")
+        print_separator()
+
+    # Load the agent while the user types the first question
+    def warmed_up(task):
+        if not task.cancelled() and task.exception() is not None:
+            print_status(f"Agent failed to load: {task.exception()}", "error")
+
+    warm_up = asyncio.ensure_future(load_agent())
+    warm_up.add_done_callback(warmed_up)
+
+    queue = JobQueue(research, write_stdout, on_finish=finished, max_running=MAX_RUNNING_QUERIES)
+    lines = asyncio.Queue()
+    wanted = threading.Event()
+    start_input_reader(asyncio.get_running_loop(), lines, wanted)
+
+    try:
+        while True:
+            wanted.set()
+            user_input = await lines.get()
+            command = (user_input or "").strip().lower()
             
-            if user_input.lower() in ["exit", "quit", "bye"]:
-                print(f"\n{Fore.CYAN}╔══════════════════════════════════════════╗")
-                print(f"{Fore.CYAN}║  {Fore.YELLOW}👋 Thank you for using Research Pro!  {Fore.CYAN}║")
-                print(f"{Fore.CYAN}║  {Fore.GREEN}Happy researching and learning!       {Fore.CYAN}║")
-                print(f"{Fore.CYAN}╚══════════════════════════════════════════╝{Style.RESET_ALL}\n")
+            if user_input is None or command in ["exit", "quit", "bye"]:
+                unfinished = [job for job in queue.pending() if not job.ended]
+                if unfinished:
+                    print_status(f"Waiting for {len(unfinished)} unfinished queries (Ctrl+C to stop them)...", "thinking")
+                await queue.wait()
+                print_goodbye()
                 break
             
-            if not user_input.strip():
+            if not command:
                 continue
 
-            conversation_count += 1
-            print_status(f"Processing query #{conversation_count}...", "thinking")
-            
-            # Animate thinking
-            for i in range(3):
-                sys.stdout.write(f"\r{Fore.YELLOW}⏳ Analyzing")
-                for j in range(i + 1):
-                    sys.stdout.write(".")
-                sys.stdout.flush()
-                time.sleep(0.3)
-            print()  # New line after animation
-
-            # Run agent with message history
-            response = await agent.run(user_input, message_history=message_history)
-            
-            # Display response with formatting
-            print(f"\n{Fore.MAGENTA}╔═══ Research Pro Response ═══╗{Style.RESET_ALL}")
-            print(f"{Fore.WHITE}{response.output}{Style.RESET_ALL}")
-            print(f"{Fore.MAGENTA}╚═══════════════════════════════╝{Style.RESET_ALL}\n")
+            if command == "saved":
+                print_saved_reports()
+                continue
 
-            # Update message history
-            message_history = response.all_messages()
-            
-            print_status("Response complete!", "success")
-            print_separator()
+            if command == "metrics":
+                print_metrics()
+                continue
+
+            if command == "status":
+                print_readiness()
+                print_jobs(queue.pending())
+                continue
+
+            if command == "cancel" or command.startswith("cancel "):
+                target = command[len("cancel"):].strip().lstrip("#")
+                if target == "all":
+                    cancelled = queue.cancel()
+                elif target.isdigit():
+                    cancelled = queue.cancel(int(target))
+                elif not target and queue.pending():
+                    # The query whose answer is on screen
+                    cancelled = queue.cancel(queue.pending()[0].number)
+                else:
+                    cancelled = []
+                for job in cancelled:
+                    print_status(f"Cancelling query #{job.number}: {job.query[:60]}", "info")
+                if not cancelled:
+                    print_status("Nothing to cancel (try 'status', 'cancel N' or 'cancel all').", "info")
+                continue
+
+            running = sum(1 for job in queue.pending() if not job.ended)
+            job = queue.submit(user_input)
+            if queue.is_front(job):
+                print_status(f"Processing query #{job.number}...", "thinking")
+            elif running >= MAX_RUNNING_QUERIES:
+                print_status(f"Query #{job.number} queued; it starts when a running query finishes.", "thinking")
+            else:
+                print_status(f"Processing query #{job.number}; its answer follows the earlier ones.", "thinking")
             
-        except KeyboardInterrupt:
-            print(f"\n\n{Fore.YELLOW}⚠ Interrupted by user{Style.RESET_ALL}")
-            print(f"{Fore.CYAN}👋 Goodbye! Happy researching!{Style.RESET_ALL}\n")
-            break
-        except Exception as e:
-            print_status(f"Error: {str(e)}", "error")
-            # logfire.error(f"Error in main loop: {str(e)}")  # Commented out
-            print_separator()
+    except asyncio.CancelledError:
+        # Ctrl+C: asyncio.run cancels this task instead of raising KeyboardInterrupt here
+        print(f"\n\n{Fore.YELLOW}⚠ Interrupted by user{Style.RESET_ALL}")
+        print(f"{Fore.CYAN}👋 Goodbye! Happy researching!{Style.RESET_ALL}\n")
+        queue.cancel()
+        await queue.wait()
+    finally:
+        # Release pooled search connections and worker threads before the event loop shuts down
+        await close_loaded_tools()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Research Pro - AI research assistant")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="research every query in FILE (one per line, '-' for stdin) instead of chatting")
+    parser.add_argument("--output", default="batch_results.jsonl",
+                        help="JSONL file for batch results; rerunning with the same file resumes the batch")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("RESEARCH_BATCH_CONCURRENCY", "4")),
+                        help="queries researched at once in batch mode")
+    parser.add_argument("--save", action="store_true", help="also save each batch answer with save_research")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        if args.batch:
+            asyncio.run(batch_main(args))
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
-        print(f"\n{Fore.CYAN}Session terminated. Goodbye!{Style.RESET_ALL}")
+        if args.batch:
+            print(f"\n{Fore.YELLOW}⚠ Batch interrupted; rerun the same command to resume.{Style.RESET_ALL}")
+        else:
+            print(f"\n{Fore.CYAN}Session terminated. Goodbye!{Style.RESET_ALL}")
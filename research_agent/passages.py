@@ -0,0 +1,90 @@
+import math
+import re
+from collections import Counter
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "he", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "to", "was", "were", "what", "when", "where", "which",
+    "who", "why", "will", "with", "how", "did", "does", "do", "about", "tell", "me",
+}
+
+
+def tokenize(text: str) -> list:
+    return [word for word in re.findall(r'\w+', text.lower()) if word not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def split_passages(text: str, max_words: int = 120) -> list:
+    """Split article text into passages of whole paragraphs, at most about max_words each
+
+    Section headings ("== History ==") start a new passage; a single overlong
+    paragraph is cut at sentence boundaries.
+    """
+    passages = []
+    current = []
+    current_words = 0
+
+    def flush():
+        nonlocal current, current_words
+        if current:
+            passages.append(' '.join(current))
+        current, current_words = [], 0
+
+    for paragraph in re.split(r'\n\s*\n|\n(?==)|(?<==)\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph or re.fullmatch(r'=+[^=]*=+', paragraph):
+            flush()
+            continue
+        pieces = [paragraph]
+        if len(paragraph.split()) > max_words:
+            pieces = re.split(r'(?<=[.!?])\s+', paragraph)
+        for piece in pieces:
+            words = len(piece.split())
+            if current and current_words + words > max_words:
+                flush()
+            current.append(piece)
+            current_words += words
+    flush()
+    return passages
+
+
+def bm25_rank(query: str, passages: list, k1: float = 1.5, b: float = 0.75) -> list:
+    """(score, index) for passages matching the query, best first"""
+    terms = set(tokenize(query))
+    if not terms or not passages:
+        return []
+    documents = [Counter(tokenize(passage)) for passage in passages]
+    lengths = [sum(document.values()) for document in documents]
+    average = sum(lengths) / len(lengths) or 1
+    frequency = {term: sum(1 for document in documents if term in document) for term in terms}
+
+    scored = []
+    for index, (document, length) in enumerate(zip(documents, lengths)):
+        score = 0.0
+        for term in terms:
+            count = document.get(term)
+            if not count:
+                continue
+            idf = math.log(1 + (len(documents) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+            score += idf * count * (k1 + 1) / (count + k1 * (1 - b + b * length / average))
+        if score > 0:
+            scored.append((score, index))
+    scored.sort(reverse=True)
+    return scored
+
+
+def best_passages(query: str, passages: list, token_budget: int) -> list:
+    """Indices of the highest-ranked passages that together fit in token_budget, best first"""
+    chosen = []
+    used = 0
+    for _, index in bm25_rank(query, passages):
+        cost = estimate_tokens(passages[index])
+        if used + cost > token_budget:
+            continue
+        chosen.append(index)
+        used += cost
+    return chosen
@@ -0,0 +1,166 @@
+import asyncio
+import glob
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def write_atomic(path: str, data: bytes, compress: bool = False):
+    """Write data to path via a temp file and rename, so readers never see half a file"""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if compress:
+                with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+                    gz.write(data)
+            else:
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_report(path: str) -> str:
+    """Text of a saved report, compressed or not"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def report_paths(directory: str) -> list:
+    """Saved reports in a directory, compressed or not"""
+    return glob.glob(os.path.join(directory, "*.txt")) + glob.glob(os.path.join(directory, "*.txt.gz"))
+
+
+def split_report(path: str, content: str):
+    """(topic, body) of a saved report: the topic from its header (else the file name), the body after it"""
+    match = re.search(r'^Topic: (.*)$', content, re.MULTILINE)
+    topic = match.group(1).strip() if match else os.path.basename(path).split('.')[0]
+    # The body, not save_research's banner
+    header = re.match(r'\s*(?:=+\n.*?\n)*?Generated: .*\n=+\n', content)
+    if header:
+        content = content[header.end():]
+    return topic, content
+
+
+class ReportWriter:
+    """Write-behind store for research reports
+
+    save() returns as soon as the report is queued; one background thread
+    writes reports in order, atomically and optionally gzip-compressed, then
+    appends a line to manifest.jsonl so listing reports never has to scan or
+    open them. Reports saved before the manifest existed are added to it, once,
+    the first time reports are listed. after_write(path, topic, content) runs on
+    the writer thread once a report is on disk (used to index it).
+    """
+
+    def __init__(self, output_dir: str, compress: bool = False, after_write=None):
+        self.output_dir = output_dir
+        self.compress = compress
+        self.after_write = after_write
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-writer")
+        self._pending = set()
+        self._manifest_backfilled = False
+
+    def save(self, stem: str, topic: str, text: str, content: str) -> str:
+        """Queue a report; returns the path it will have once written"""
+        extension = ".txt.gz" if self.compress else ".txt"
+        path = os.path.join(self.output_dir, stem + extension)
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, self._write, path, topic, text, content
+        )
+        self._pending.add(future)
+        future.add_done_callback(self._finished)
+        return path
+
+    def _finished(self, future):
+        self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            print(f"❌ Error saving research: {future.exception()}")
+
+    def _write(self, path: str, topic: str, text: str, content: str):
+        os.makedirs(self.output_dir, exist_ok=True)
+        data = text.encode("utf-8")
+        write_atomic(path, data, self.compress)
+        entry = {
+            "file": os.path.basename(path),
+            "topic": topic,
+            "saved_at": time.time(),
+            "chars": len(content),
+            "bytes": os.path.getsize(path),
+        }
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), "a", encoding="utf-8") as manifest:
+            manifest.write(json.dumps(entry) + "\n")
+        if self.after_write is not None:
+            self.after_write(path, topic, content)
+
+    async def flush(self):
+        """Wait until every queued report is on disk"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    async def close(self):
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+    def _backfill_manifest(self) -> int:
+        """Put reports missing from the manifest at its start, oldest first; returns how many"""
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        lines = []
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as manifest:
+                lines = manifest.readlines()
+        listed = set()
+        for line in lines:
+            try:
+                listed.add(json.loads(line)["file"])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+
+        entries = []
+        for report_path in report_paths(self.output_dir):
+            if os.path.basename(report_path) in listed:
+                continue
+            topic, body = split_report(report_path, read_report(report_path))
+            entries.append({
+                "file": os.path.basename(report_path),
+                "topic": topic,
+                "saved_at": os.path.getmtime(report_path),
+                "chars": len(body),
+                "bytes": os.path.getsize(report_path),
+            })
+        if entries:
+            entries.sort(key=lambda entry: entry["saved_at"])
+            data = "".join(json.dumps(entry) + "\n" for entry in entries) + "".join(lines)
+            write_atomic(path, data.encode("utf-8"))
+        return len(entries)
+
+    def list_reports(self, limit: int = None) -> list:
+        """Manifest entries, newest first; a torn last line from a crash is skipped"""
+        if not self._manifest_backfilled:
+            # On the writer thread, so it can't interleave with a report being added
+            self._executor.submit(self._backfill_manifest).result()
+            self._manifest_backfilled = True
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, encoding="utf-8") as manifest:
+            for line in manifest:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        entries.reverse()
+        return entries[:limit] if limit else entries
@@ -0,0 +1,87 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from report_store import read_report, report_paths, split_report
+
+SNIPPET_TOKENS = 32
+
+
+def fts_query(text: str) -> str:
+    """FTS5 MATCH expression for free text: any of its words, each quoted"""
+    words = re.findall(r'\w+', text.lower())
+    return ' OR '.join(f'"{word}"' for word in words)
+
+
+class ResearchIndex:
+    """SQLite FTS5 index of saved research reports, ranked with bm25
+
+    Safe to share between threads (the report writer adds, the CLI searches):
+    every use of the connection holds the lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE VIRTUAL TABLE IF NOT EXISTS reports USING fts5(
+                path UNINDEXED,
+                topic,
+                saved_at UNINDEXED,
+                content,
+                tokenize = 'porter unicode61'
+            )"""
+        )
+        self._conn.commit()
+
+    def add(self, path: str, topic: str, content: str, saved_at: float = None):
+        """Index one report, replacing any earlier entry for the same file"""
+        with self._lock:
+            self._conn.execute("DELETE FROM reports WHERE path = ?", (path,))
+            self._conn.execute(
+                "INSERT INTO reports (path, topic, saved_at, content) VALUES (?, ?, ?, ?)",
+                (path, topic, saved_at or time.time(), content),
+            )
+            self._conn.commit()
+
+    def backfill(self, directory: str) -> int:
+        """Index reports saved before the index existed; returns how many were added"""
+        with self._lock:
+            indexed = {row[0] for row in self._conn.execute("SELECT path FROM reports")}
+        added = 0
+        for path in report_paths(directory):
+            if path in indexed:
+                continue
+            topic, content = split_report(path, read_report(path))
+            self.add(path, topic, content, os.path.getmtime(path))
+            added += 1
+        return added
+
+    def search(self, query: str, limit: int = 5) -> list:
+        """Best matching reports as dicts with path, topic, saved_at, snippet and content"""
+        expression = fts_query(query)
+        if not expression:
+            return []
+        # Topic matches count ten times as much as body matches; lower bm25 is better
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT path, topic, saved_at, snippet(reports, 3, '**', '**', '…', {SNIPPET_TOKENS}),
+                           content, bm25(reports, 0.0, 10.0, 0.0, 1.0) AS score
+                    FROM reports WHERE reports MATCH ? ORDER BY score LIMIT ?""",
+                (expression, limit),
+            ).fetchall()
+        return [
+            {'path': path, 'topic': topic, 'saved_at': saved_at, 'snippet': snippet, 'content': content, 'score': score}
+            for path, topic, saved_at, snippet, content, score in rows
+        ]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM reports").fetchone()[0]
+
+
+def default_index_path(output_dir: str) -> str:
+    return os.getenv("RESEARCH_INDEX_PATH", os.path.join(output_dir, "research_index.db"))
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+
+# How long results stay fresh, per source (seconds)
+DEFAULT_TTLS = {
+    "wikipedia": float(os.getenv("RESEARCH_WIKIPEDIA_TTL", str(24 * 60 * 60))),
+    "duckduckgo": float(os.getenv("RESEARCH_DDG_TTL", str(60 * 60))),
+}
+# "No results" answers, and results missing parts that failed to load, are remembered for less time
+NEGATIVE_TTL = float(os.getenv("RESEARCH_NEGATIVE_TTL", "600"))
+# Past its TTL an entry is still served for this many TTLs while it is refreshed in the background
+STALE_FACTOR = 3
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: lowercase, single spaces, no surrounding punctuation"""
+    return re.sub(r'\s+', ' ', query).strip().lower().strip('.!?"\'')
+
+
+class SearchCache:
+    """Two-tier cache of search tool results: in-memory LRU over a SQLite table
+
+    Entries are keyed on (source, normalized query and any variant). Stale entries are returned
+    immediately while one background fetch refreshes them, and identical
+    concurrent lookups share a single fetch. Fetch errors are never cached.
+    """
+
+    def __init__(self, path: str, max_entries: int = 256, ttls: dict = None, enabled: bool = True):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = ttls or DEFAULT_TTLS
+        self.enabled = enabled
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._refreshes = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._conn = None
+        if enabled:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS search_results (
+                    source TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    negative INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    PRIMARY KEY (source, query)
+                )"""
+            )
+            self._conn.commit()
+
+    def _ttl(self, source: str, negative: bool) -> float:
+        ttl = self.ttls.get(source, 60 * 60)
+        return min(ttl, NEGATIVE_TTL) if negative else ttl
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key):
+        """(stored_at, result, negative) from memory, falling back to disk"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        row = self._conn.execute(
+            "SELECT stored_at, result, negative FROM search_results WHERE source = ? AND query = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        entry = (row[0], row[1], bool(row[2]))
+        self._remember(key, entry)
+        return entry
+
+    def _store(self, key, result: str, negative: bool):
+        entry = (time.time(), result, negative)
+        self._remember(key, entry)
+        if self._conn is None:
+            return
+        self._conn.execute("INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?)", (*key, result, int(negative), entry[0]))
+        self._conn.commit()
+
+    async def _fetch(self, key, fetch):
+        """Run fetch() once for all concurrent callers of the same key and store its result"""
+        task = self._inflight.get(key)
+        if task is None:
+            async def run():
+                try:
+                    result, found = await fetch()
+                    self._store(key, result, not found)
+                    return result
+                finally:
+                    del self._inflight[key]
+            task = asyncio.ensure_future(run())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    def _refresh(self, key, fetch):
+        if key in self._inflight:
+            return
+        task = asyncio.ensure_future(self._fetch(key, fetch))
+        self._refreshes.add(task)
+
+        def done(task):
+            self._refreshes.discard(task)
+            # A failed refresh leaves the stale entry in place until it expires
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(done)
+
+    async def get_or_fetch(self, source: str, query: str, fetch, variant: str = "") -> str:
+        """Cached result for a query, calling `await fetch()` -> (result, found) on a miss
+
+        `variant` names settings that change the result, so each gets its own entry.
+        """
+        if not self.enabled:
+            result, _ = await fetch()
+            return result
+
+        key = (source, normalize_query(query) + (f" [{variant}]" if variant else ""))
+        entry = self._load(key)
+        if entry is not None:
+            stored_at, result, negative = entry
+            age = time.time() - stored_at
+            ttl = self._ttl(source, negative)
+            if age < ttl:
+                self.hits += 1
+                return result
+            if age < ttl * STALE_FACTOR:
+                self.stale_hits += 1
+                self._refresh(key, fetch)
+                return result
+
+        self.misses += 1
+        return await self._fetch(key, fetch)
+
+    async def close(self):
+        for task in list(self._refreshes):
+            task.cancel()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self.enabled = False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            "entries": len(self._memory),
+        }
+
+
+def default_cache_path() -> str:
+    return os.getenv(
+        "RESEARCH_CACHE_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_cache.db"),
+    )
@@ -1,11 +1,228 @@
 from pydantic_ai import RunContext
+import asyncio
 import httpx
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import os
 from datetime import datetime
 import json
 import re
-from duckduckgo_search import DDGS
+from search_cache import SearchCache, default_cache_path
+from research_index import ResearchIndex, default_index_path
+from report_store import ReportWriter
+from passages import split_passages, best_passages
 
+# Search endpoints; point these at a local stand-in to benchmark without the network
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+# When set, DuckDuckGo results are fetched as JSON from this URL instead of through DDGS
+DDG_API_URL = os.getenv("DDG_API_URL")
+SEARCH_TIMEOUT = float(os.getenv("RESEARCH_SEARCH_TIMEOUT", "10"))
+# Token budget for the article passages web_search returns (0 = titles and descriptions only)
+PASSAGE_TOKENS = int(os.getenv("RESEARCH_PASSAGE_TOKENS", "800"))
+# Words per passage when splitting article text
+PASSAGE_WORDS = int(os.getenv("RESEARCH_PASSAGE_WORDS", "120"))
+
+# Where save_research writes reports (relative to the working directory)
+OUTPUT_DIR = "research_outputs"
+# Characters of the best saved report handed back to the agent in full
+SAVED_EXCERPT_CHARS = 2000
+# Store reports gzip-compressed (.txt.gz)
+COMPRESS_REPORTS = os.getenv("RESEARCH_COMPRESS_REPORTS", "0") == "1"
+
+# Connection pool shared by every HTTP tool
+MAX_CONNECTIONS = int(os.getenv("RESEARCH_MAX_CONNECTIONS", "20"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("RESEARCH_MAX_CONNECTIONS_PER_HOST", "6"))
+HTTP2 = os.getenv("RESEARCH_HTTP2", "0") == "1"
+
+# DDGS is synchronous, so it runs on a small dedicated pool instead of the event loop
+DDG_WORKERS = int(os.getenv("RESEARCH_DDG_WORKERS", "4"))
+DDG_TIMEOUT = float(os.getenv("RESEARCH_DDG_TIMEOUT", "8"))
+
+_http_client = None
+_ddg_pool = None
+_research_index = None
+# Both the event loop and the report writer thread may be first to need the index
+_research_index_lock = threading.Lock()
+_report_writer = None
+
+# Search results by source and normalized query, in memory and on disk
+search_cache = SearchCache(
+    default_cache_path(),
+    max_entries=int(os.getenv("RESEARCH_CACHE_SIZE", "256")),
+    enabled=os.getenv("RESEARCH_SEARCH_CACHE", "1") == "1",
+)
+# Host -> semaphore capping concurrent requests to it (httpx only limits the whole pool)
+_host_slots = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The process-wide pooled client, created on first use"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        http2 = HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401  (httpx needs it for HTTP/2)
+            except ImportError:
+                print("⚠️ RESEARCH_HTTP2=1 but the h2 package isn't installed, using HTTP/1.1")
+                http2 = False
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(SEARCH_TIMEOUT, connect=5.0),
+            headers={"User-Agent": "ResearchPro/1.0 (research assistant CLI)"},
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared client's connections; call once when the CLI exits"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_research_index() -> ResearchIndex:
+    """Full-text index of saved reports, created (and backfilled from disk) on first use
+
+    The first call reads every saved report, so call it off the event loop.
+    """
+    global _research_index
+    with _research_index_lock:
+        if _research_index is None:
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            index = ResearchIndex(default_index_path(OUTPUT_DIR))
+            index.backfill(OUTPUT_DIR)
+            _research_index = index
+    return _research_index
+
+
+def get_report_writer() -> ReportWriter:
+    """Background writer for save_research, indexing each report once it's on disk"""
+    global _report_writer
+    if _report_writer is None:
+        _report_writer = ReportWriter(
+            OUTPUT_DIR,
+            compress=COMPRESS_REPORTS,
+            after_write=lambda path, topic, content: get_research_index().add(path, topic, content),
+        )
+    return _report_writer
+
+
+async def close_tools():
+    """Finish pending saves, then release the search cache, HTTP pool and DDG worker threads
+
+    Call once when the CLI exits.
+    """
+    global _ddg_pool, _report_writer
+    if _report_writer is not None:
+        await _report_writer.close()
+        _report_writer = None
+    await search_cache.close()
+    await close_http_client()
+    if _ddg_pool is not None:
+        _ddg_pool.shutdown(wait=False, cancel_futures=True)
+        _ddg_pool = None
+
+
+async def http_get(url: str, **kwargs) -> httpx.Response:
+    """GET through the shared client, at most MAX_CONNECTIONS_PER_HOST at a time per host"""
+    host = httpx.URL(url).host
+    slot = _host_slots.setdefault(host, asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST))
+    async with slot:
+        return await get_http_client().get(url, **kwargs)
+
+
+async def _wikipedia_extract(title: str) -> str:
+    """Plain-text extract of one article ('' if it has none)"""
+    response = await http_get(
+        WIKIPEDIA_API_URL,
+        params={
+            "action": "query",
+            "prop": "extracts",
+            "explaintext": 1,
+            "redirects": 1,
+            "titles": title,
+            "format": "json"
+        },
+    )
+    response.raise_for_status()
+    pages = response.json().get("query", {}).get("pages", {})
+    return "\n\n".join(page.get("extract", "") for page in pages.values())
+
+
+async def _wikipedia_passages(query: str, titles: list):
+    """(title, passage) pairs from the articles that best match the query, within PASSAGE_TOKENS,
+    and whether every article loaded"""
+    # The extracts API returns one full article per request, so fetch them side by side
+    extracts = await asyncio.gather(*(_wikipedia_extract(title) for title in titles), return_exceptions=True)
+    sources = []
+    passages = []
+    complete = True
+    for title, extract in zip(titles, extracts):
+        if isinstance(extract, Exception):
+            complete = False
+            continue
+        for passage in split_passages(extract, PASSAGE_WORDS):
+            sources.append(title)
+            passages.append(passage)
+    ranked = [(sources[index], passages[index]) for index in best_passages(query, passages, PASSAGE_TOKENS)]
+    return ranked, complete
+
+
+async def _wikipedia_results(query: str):
+    """(formatted results, found) from the Wikipedia OpenSearch API; raises on HTTP errors
+
+    Results missing an article that failed to load count as not found, so
+    they're cached only briefly.
+    """
+    wiki_response = await http_get(
+        WIKIPEDIA_API_URL,
+        params={
+            "action": "opensearch",
+            "search": query,
+            "limit": 3,
+            "namespace": 0,
+            "format": "json"
+        },
+    )
+    wiki_response.raise_for_status()
+
+    results = []
+    complete = True
+    wiki_data = wiki_response.json()
+    if len(wiki_data) >= 4 and wiki_data[1]:
+        titles = wiki_data[1]
+        descriptions = wiki_data[2]
+        urls = wiki_data[3]
+        
+        results.append(f"📚 **Wikipedia Results:**\n")
+        for i in range(min(len(titles), 3)):
+            if titles[i]:
+                results.append(f"{i+1}. **{titles[i]}**")
+                if i < len(descriptions) and descriptions[i]:
+                    results.append(f"   {descriptions[i]}")
+                if i < len(urls) and urls[i]:
+                    results.append(f"   🔗 {urls[i]}\n")
+        
+        if PASSAGE_TOKENS > 0:
+            # Article text ranked locally, so the agent gets answers rather than just pointers
+            passages, complete = await _wikipedia_passages(query, [title for title in titles[:3] if title])
+            if passages:
+                results.append("**Most relevant passages:**\n")
+                for title, passage in passages:
+                    results.append(f"[{title}] {passage}\n")
+    
+    if results:
+        return "\n".join(results), complete
+    return f"No Wikipedia results found for '{query}'", False
 
 async def web_search(ctx: RunContext[str], query: str) -> str:
     """
@@ -16,52 +233,64 @@ async def web_search(ctx: RunContext[str], query: str) -> str:
         query: The search query to look up
     
     Returns:
-        Formatted Wikipedia search results with relevant information
+        Top Wikipedia articles plus their passages most relevant to the query
     """
     try:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            results = []
-            
-            # Try Wikipedia OpenSearch API
-            try:
-                wiki_response = await client.get(
-                    "https://en.wikipedia.org/w/api.php",
-                    params={
-                        "action": "opensearch",
-                        "search": query,
-                        "limit": 3,
-                        "namespace": 0,
-                        "format": "json"
-                    },
-                    timeout=10.0
-                )
-                
-                if wiki_response.status_code == 200:
-                    wiki_data = wiki_response.json()
-                    if len(wiki_data) >= 4 and wiki_data[1]:
-                        titles = wiki_data[1]
-                        descriptions = wiki_data[2]
-                        urls = wiki_data[3]
-                        
-                        results.append(f"📚 **Wikipedia Results:**\n")
-                        for i in range(min(len(titles), 3)):
-                            if titles[i]:
-                                results.append(f"{i+1}. **{titles[i]}**")
-                                if i < len(descriptions) and descriptions[i]:
-                                    results.append(f"   {descriptions[i]}")
-                                if i < len(urls) and urls[i]:
-                                    results.append(f"   🔗 {urls[i]}\n")
-                        
-                        if results:
-                            return "\n".join(results)
-            except Exception as e:
-                pass
-                
-            return f"No Wikipedia results found for '{query}'"
-            
+        # Results depend on the passage budget as well as the query
+        return await search_cache.get_or_fetch("wikipedia", query, lambda: _wikipedia_results(query),
+                                               variant=f"passages={PASSAGE_TOKENS}")
     except Exception as e:
         return f"Search error: {str(e)[:150]}"
 
+async def _ddg_results(query: str, max_results: int) -> list:
+    """DuckDuckGo text results as dicts with title, href and body"""
+    if DDG_API_URL:
+        response = await http_get(DDG_API_URL, params={"q": query, "max_results": max_results})
+        response.raise_for_status()
+        return response.json()[:max_results]
+    global _ddg_pool
+    if _ddg_pool is None:
+        _ddg_pool = ThreadPoolExecutor(max_workers=DDG_WORKERS, thread_name_prefix="ddg")
+
+    cancelled = threading.Event()
+
+    def search():
+        if cancelled.is_set():
+            # Gave up while this call was still queued
+            return []
+        # Imported on first use: it's slow to load and unused when DDG_API_URL is set
+        from duckduckgo_search import DDGS
+        results = []
+        # DDGS's own timeout bounds how long a worker can stay busy after we give up
+        with DDGS(timeout=math.ceil(DDG_TIMEOUT)) as ddgs:
+            for r in ddgs.text(query, max_results=max_results):
+                if cancelled.is_set():
+                    break
+                results.append(r)
+        return results
+
+    loop = asyncio.get_running_loop()
+    try:
+        # The deadline covers time queued for a worker as well as the search itself
+        return await asyncio.wait_for(loop.run_in_executor(_ddg_pool, search), timeout=DDG_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        cancelled.set()
+        raise
+
+async def _duck_results_text(query: str):
+    """(formatted results, found) from DuckDuckGo"""
+    results = []
+    for r in await _ddg_results(query, max_results=3):
+        title = r.get('title', 'No Title')
+        snippet = r.get('body', 'No Snippet')
+        url = r.get('href') or r.get('url', 'No URL')
+        
+        results.append(f"**{title}**\n{snippet}\n🔗 {url}\n")
+    
+    if results:
+        return "🦆 **DuckDuckGo Results:**\n\n" + "\n".join(results), True
+    return f"No DuckDuckGo results found for '{query}'", False
+
 async def duck_search(ctx: RunContext[str], query: str) -> str:
     """
     Perform a DuckDuckGo web search for general information.
@@ -73,19 +302,9 @@ async def duck_search(ctx: RunContext[str], query: str) -> str:
         Formatted DuckDuckGo search results with URLs and descriptions
     """ 
     try:
-        with DDGS() as ddgs:
-            results = []
-            for r in ddgs.text(query, max_results=3):
-                title = r.get('title', 'No Title')
-                snippet = r.get('body', 'No Snippet')
-                url = r.get('url', 'No URL')
-                
-                results.append(f"**{title}**\n{snippet}\n🔗 {url}\n")
-            
-            if results:
-                return "🦆 **DuckDuckGo Results:**\n\n" + "\n".join(results)
-            else:
-                return f"No DuckDuckGo results found for '{query}'"
+        return await search_cache.get_or_fetch("duckduckgo", query, lambda: _duck_results_text(query))
+    except asyncio.TimeoutError:
+        return f"DuckDuckGo search timed out after {DDG_TIMEOUT:g}s for '{query}'"
     except Exception as e:
         return f"DuckDuckGo search error: {str(e)[:150]}"
 
@@ -102,6 +321,27 @@ async def get_date_time(ctx: RunContext[str]) -> str:
     now = datetime.now()
     return f"📅 **Current Date & Time:**\n{now.strftime('%A, %B %d, %Y at %I:%M:%S %p')}"
 
+def write_report(filename: str, content: str) -> str:
+    """Queue a research report with its header; returns the path it is written to"""
+    # Clean filename and add timestamp
+    clean_filename = re.sub(r'[^\w\s-]', '', filename).strip()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    # Add header to content
+    header = f"""
+{'=' * 70}
+RESEARCH REPORT
+{'=' * 70}
+Topic: {filename}
+Generated: {datetime.now().strftime('%A, %B %d, %Y at %I:%M:%S %p')}
+{'=' * 70}
+
+"""
+    full_content = header + content
+    
+    # Written (atomically) and indexed by a background thread, so the agent doesn't wait on disk
+    return get_report_writer().save(f"{clean_filename}_{timestamp}", filename, full_content, content)
+
 async def save_research(ctx: RunContext[str], filename: str, content: str) -> str:
     """
     Save research findings to a file in the research_outputs folder.
@@ -115,33 +355,44 @@ async def save_research(ctx: RunContext[str], filename: str, content: str) -> st
         Confirmation message with file path
     """
     try:
-        # Create research_outputs directory if it doesn't exist
-        output_dir = "research_outputs"
-        os.makedirs(output_dir, exist_ok=True)
+        filepath = write_report(filename, content)
         
-        # Clean filename and add timestamp
-        clean_filename = re.sub(r'[^\w\s-]', '', filename).strip()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        full_filename = f"{clean_filename}_{timestamp}.txt"
-        filepath = os.path.join(output_dir, full_filename)
+        # Written in the background; failures are reported on the terminal when they happen
+        return f"✅ **Research queued for saving!**\n📁 File: {filepath}\n📊 Size: {len(content)} characters"
         
-        # Add header to content
-        header = f"""
-{'=' * 70}
-RESEARCH REPORT
-{'=' * 70}
-Topic: {filename}
-Generated: {datetime.now().strftime('%A, %B %d, %Y at %I:%M:%S %p')}
-{'=' * 70}
+    except Exception as e:
+        return f"❌ Error saving research: {str(e)}"
 
-"""
-        full_content = header + content
+async def search_saved_research(ctx: RunContext[str], query: str) -> str:
+    """
+    Search research reports saved earlier with save_research.
+    
+    Args:
+        ctx: The run context
+        query: Topic or keywords to look for
+    
+    Returns:
+        Ranked matching reports with snippets, plus an excerpt of the best match
+    """
+    try:
+        # The first use backfills the index from disk, which mustn't block the event loop
+        index = await asyncio.to_thread(get_research_index)
+        matches = index.search(query, limit=5)
+        if not matches:
+            return f"No saved research found for '{query}'"
         
-        # Save to file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(full_content)
+        results = ["📂 **Saved Research:**\n"]
+        for i, match in enumerate(matches, 1):
+            saved = datetime.fromtimestamp(float(match['saved_at'])).strftime('%B %d, %Y')
+            results.append(f"{i}. **{match['topic']}** (saved {saved})")
+            results.append(f"   {' '.join(match['snippet'].split())}")
+            results.append(f"   📁 {match['path']}\n")
         
-        return f"✅ **Research saved successfully!**\n📁 File: {filepath}\n📊 Size: {len(content)} characters"
+        best = matches[0]['content'].strip()
+        if len(best) > SAVED_EXCERPT_CHARS:
+            best = best[:SAVED_EXCERPT_CHARS] + "…"
+        results.append(f"**Best match ({matches[0]['topic']}):**\n{best}")
+        return "\n".join(results)
         
     except Exception as e:
-        return f"❌ Error saving research: {str(e)}"
+        return f"Saved research search error: {str(e)[:150]}"